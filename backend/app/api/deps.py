@@ -1,19 +1,154 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status, Header
+from typing import Any, Dict, Generator, Optional
+from collections import OrderedDict
+from uuid import UUID
+import asyncio
+import time
+from fastapi import Depends, HTTPException, Request, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+from sqlalchemy.orm import Session, joinedload
+from jwt import InvalidTokenError
 
 from app.db.session import get_db
+from app.db.redis import redis_client
+from app.core.logging import logger
 from app.core.config import settings
-from app.core.security import decode_token
+from app.core.security import decode_token, credentials_exception
 from app.models import User, APIKey
-from app.core.security import verify_api_key
+from app.core.security import verify_api_key, api_key_lookup_digest
+from app.services.api_keys import API_KEY_PREFIX_LENGTH
 
 security = HTTPBearer(auto_error=False)
 
 
+# Error responses, built per raise (see credentials_exception)
+def inactive_api_key() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="API key is inactive",
+    )
+
+
+def inactive_user() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Inactive user",
+    )
+
+
+def not_enough_permissions() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Not enough permissions",
+    )
+
+
+def project_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Project not found",
+    )
+
+
+def bigquery_not_configured() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="BigQuery not configured for this project",
+    )
+
+
+def too_many_invalid_api_keys() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many invalid API keys",
+    )
+
+
+# Decoded JWT payloads keyed by raw token, evicted LRU and expired at token "exp"
+TOKEN_CACHE_MAX_SIZE = 10_000
+_token_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _decode_token_cached(token: str) -> Dict[str, Any]:
+    """Decode a JWT, reusing the verified payload for repeated tokens"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            _token_cache.move_to_end(token)
+            return payload
+        del _token_cache[token]
+
+    payload = decode_token(token)
+
+    _token_cache[token] = payload
+    if len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+        _token_cache.popitem(last=False)
+
+    return payload
+
+
+def _api_key_miss_key(client_ip: str) -> str:
+    return f"apikey_miss:{client_ip}"
+
+
+async def _check_api_key_miss_limit(client_ip: str) -> None:
+    """Reject a client that is over its per-minute allowance of unknown API keys"""
+    try:
+        misses = await redis_client.get(_api_key_miss_key(client_ip))
+    except Exception as e:
+        logger.warning(f"API key miss counter unavailable: {str(e)}")
+        return
+
+    if misses is not None and int(misses) >= settings.API_KEY_MISS_LIMIT_PER_MINUTE:
+        raise too_many_invalid_api_keys()
+
+
+async def _record_api_key_miss(client_ip: str) -> None:
+    """Count an unknown API key against the client's per-minute allowance"""
+    key = _api_key_miss_key(client_ip)
+    try:
+        misses = await redis_client.incr(key)
+        if misses == 1:
+            await redis_client.expire(key, 60)
+    except Exception as e:
+        logger.warning(f"API key miss counter unavailable: {str(e)}")
+
+
+async def _find_api_key(db: Session, plain_key: str) -> Optional[APIKey]:
+    """Find and verify the API key row for a plaintext key"""
+    lookup = api_key_lookup_digest(plain_key)
+    api_key = (
+        db.query(APIKey)
+        .options(joinedload(APIKey.user))
+        .filter(APIKey.key_lookup == lookup)
+        .first()
+    )
+    if api_key is not None:
+        if await asyncio.to_thread(verify_api_key, plain_key, api_key.key_hash):
+            return api_key
+        return None
+
+    # Keys created before key_lookup existed: match by prefix, verify, and
+    # store the digest so the next request takes the indexed path
+    candidates = (
+        db.query(APIKey)
+        .options(joinedload(APIKey.user))
+        .filter(
+            APIKey.key_lookup.is_(None),
+            APIKey.key_prefix == plain_key[:API_KEY_PREFIX_LENGTH],
+        )
+        .all()
+    )
+    for candidate in candidates:
+        if await asyncio.to_thread(verify_api_key, plain_key, candidate.key_hash):
+            candidate.key_lookup = lookup
+            db.commit()
+            return candidate
+
+    return None
+
+
 async def get_current_user(
+    request: Request,
     db: Session = Depends(get_db),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     x_api_key: Optional[str] = Header(None),
@@ -22,49 +157,45 @@ async def get_current_user(
     Get current authenticated user
     Supports both JWT tokens and API keys
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
     # Try API key first
     if x_api_key:
-        api_key = db.query(APIKey).filter(APIKey.key_prefix == x_api_key[:10]).first()
-        if api_key and verify_api_key(x_api_key, api_key.key_hash):
+        client_ip = request.client.host if request.client else None
+        # Throttled clients are turned away before the lookup (and any Argon2 verify)
+        if client_ip:
+            await _check_api_key_miss_limit(client_ip)
+
+        api_key = await _find_api_key(db, x_api_key)
+        if not api_key:
+            if client_ip:
+                await _record_api_key_miss(client_ip)
+        else:
             if not api_key.is_active:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="API key is inactive",
-                )
-            user = db.query(User).filter(User.id == api_key.user_id).first()
-            if user:
-                return user
+                raise inactive_api_key()
+            if api_key.user:
+                return api_key.user
 
     # Try JWT token
     if credentials:
         try:
-            payload = decode_token(credentials.credentials)
+            payload = _decode_token_cached(credentials.credentials)
             user_id: str = payload.get("sub")
             if user_id is None:
-                raise credentials_exception
+                raise credentials_exception()
 
-            user = db.query(User).filter(User.id == user_id).first()
+            # Primary-key lookup: served from the identity map when already loaded
+            user = db.get(User, UUID(user_id))
             if user is None:
-                raise credentials_exception
+                raise credentials_exception()
 
             if not user.is_active:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Inactive user",
-                )
+                raise inactive_user()
 
             return user
 
-        except JWTError:
-            raise credentials_exception
+        except (InvalidTokenError, ValueError):
+            raise credentials_exception()
 
-    raise credentials_exception
+    raise credentials_exception()
 
 
 async def get_current_superuser(
@@ -72,8 +203,5 @@ async def get_current_superuser(
 ) -> User:
     """Verify current user is a superuser"""
     if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions",
-        )
+        raise not_enough_permissions()
     return current_user
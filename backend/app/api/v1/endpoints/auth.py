@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -5,9 +6,11 @@ from datetime import timedelta
 from app.db.session import get_db
 from app.models import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse, TokenResponse
+from app.schemas.fast import construct_from_orm, model_response
 from app.core.security import (
     verify_password,
     get_password_hash,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
 )
@@ -17,6 +20,8 @@ from app.api.deps import get_current_user
 
 router = APIRouter()
 
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
@@ -33,7 +38,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await asyncio.to_thread(get_password_hash, user_data.password),
         is_active=True,
         is_superuser=False,
     )
@@ -44,7 +49,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
     logger.info(f"New user registered: {user.email}")
 
-    return user
+    # Row was just written and refreshed from the DB: skip re-validation
+    return model_response(
+        construct_from_orm(UserResponse, user), status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -53,7 +61,9 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     # Find user
     user = db.query(User).filter(User.email == credentials.email).first()
 
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await asyncio.to_thread(
+        verify_password, credentials.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -65,10 +75,15 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user",
         )
 
+    # Upgrade legacy or outdated password hashes
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await asyncio.to_thread(get_password_hash, credentials.password)
+        db.commit()
+
     # Create tokens
     access_token = create_access_token(
         data={"sub": str(user.id)},
-        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        expires_delta=ACCESS_TOKEN_EXPIRES,
     )
 
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
@@ -87,4 +102,4 @@ async def get_current_user_info(
     current_user: User = Depends(get_current_user),
 ):
     """Get current user information"""
-    return current_user
+    return model_response(construct_from_orm(UserResponse, current_user))
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import Text, cast
+from sqlalchemy.orm import Session, load_only, raiseload
 from typing import List
 from uuid import UUID
-from datetime import datetime
 
+from app.db.base import utc_now
 from app.db.session import get_db
 from app.models import User, Project
 from app.schemas.project import (
@@ -13,12 +14,45 @@ from app.schemas.project import (
     BigQueryCredentials,
     SchemaInfo,
 )
-from app.api.deps import get_current_user
+from app.schemas.fast import construct_from_orm, model_response
+from app.api.deps import get_current_user, project_not_found
 from app.services.bigquery.bigquery_service import BigQueryService
+from app.services.cache.schema_cache import (
+    get_cached_schema_json,
+    set_cached_schema,
+    set_cached_schema_json,
+    invalidate_cached_schema,
+)
+from app.services.cache.query_cache import invalidate_project_queries
+from app.services.cache.semantic_cache import SemanticCache
 from app.core.logging import logger
 
 router = APIRouter()
 
+# Columns needed by ProjectResponse; skips the large schema/credentials payloads
+PROJECT_LIST_COLUMNS = (
+    Project.id,
+    Project.owner_id,
+    Project.name,
+    Project.description,
+    Project.bigquery_project_id,
+    Project.bigquery_dataset,
+    Project.schema_last_updated,
+    Project.created_at,
+    Project.updated_at,
+)
+
+
+def schema_not_available() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Schema not available. Please connect to BigQuery first.",
+    )
+
+
+# JSON text of an unset/empty schema cache
+EMPTY_SCHEMA_JSON = (None, "null", "{}")
+
 
 @router.post("", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(
@@ -41,7 +75,10 @@ async def create_project(
 
     logger.info(f"Project created: {project.name} by {current_user.email}")
 
-    return project
+    # Row was just written and refreshed from the DB: skip re-validation
+    return model_response(
+        construct_from_orm(ProjectResponse, project), status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.get("", response_model=List[ProjectResponse])
@@ -50,8 +87,15 @@ async def list_projects(
     current_user: User = Depends(get_current_user),
 ):
     """List all projects for current user"""
-    projects = db.query(Project).filter(Project.owner_id == current_user.id).all()
-    return projects
+    projects = (
+        db.query(Project)
+        .options(load_only(*PROJECT_LIST_COLUMNS))
+        .filter(Project.owner_id == current_user.id)
+        .all()
+    )
+    return model_response(
+        [construct_from_orm(ProjectResponse, project) for project in projects]
+    )
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
@@ -61,18 +105,17 @@ async def get_project(
     current_user: User = Depends(get_current_user),
 ):
     """Get project by ID"""
-    project = db.query(Project).filter(
+    project = db.query(Project).options(
+        load_only(*PROJECT_LIST_COLUMNS), raiseload("*")
+    ).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
-    return project
+    return model_response(construct_from_orm(ProjectResponse, project))
 
 
 @router.put("/{project_id}", response_model=ProjectResponse)
@@ -83,16 +126,13 @@ async def update_project(
     current_user: User = Depends(get_current_user),
 ):
     """Update project"""
-    project = db.query(Project).filter(
+    project = db.query(Project).options(raiseload("*")).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     # Update fields
     if project_data.name is not None:
@@ -107,7 +147,7 @@ async def update_project(
     db.commit()
     db.refresh(project)
 
-    return project
+    return model_response(construct_from_orm(ProjectResponse, project))
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -123,14 +163,14 @@ async def delete_project(
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     db.delete(project)
     db.commit()
 
+    await invalidate_cached_schema(str(project_id))
+    await invalidate_project_queries(str(project_id))
+
     logger.info(f"Project deleted: {project.name}")
 
 
@@ -142,16 +182,13 @@ async def connect_bigquery(
     current_user: User = Depends(get_current_user),
 ):
     """Upload BigQuery credentials and test connection"""
-    project = db.query(Project).filter(
+    project = db.query(Project).options(raiseload("*")).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     # Store encrypted credentials (in production, encrypt this!)
     project.credentials_encrypted = credentials.credentials_json
@@ -164,13 +201,18 @@ async def connect_bigquery(
         if not connection_ok:
             raise Exception("Connection test failed")
 
-        # Extract schema
+        # Materialize metric roll-ups, then extract schema (which includes them)
+        await bigquery_service.materialize_metrics()
         schema = await bigquery_service.get_schema()
         project.schema_cache = schema
-        project.schema_last_updated = datetime.utcnow()
+        project.schema_last_updated = utc_now()
+        SemanticCache(db).invalidate(str(project_id))
 
         db.commit()
 
+        await set_cached_schema(str(project_id), schema)
+        await invalidate_project_queries(str(project_id))
+
         logger.info(f"BigQuery connected for project: {project.name}")
 
         return {
@@ -194,24 +236,28 @@ async def get_schema(
     current_user: User = Depends(get_current_user),
 ):
     """Get cached BigQuery schema"""
-    project = db.query(Project).filter(
+    owned = db.query(Project.id).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id,
     ).first()
 
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+    if not owned:
+        raise project_not_found()
 
-    if not project.schema_cache:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Schema not available. Please connect to BigQuery first.",
-        )
+    schema_json = await get_cached_schema_json(str(project_id))
+
+    if schema_json is None:
+        # Fetch the stored JSON as text so it is returned without being parsed
+        schema_json = db.query(cast(Project.schema_cache, Text)).filter(
+            Project.id == project_id,
+        ).scalar()
+
+        if schema_json in EMPTY_SCHEMA_JSON:
+            raise schema_not_available()
+
+        await set_cached_schema_json(str(project_id), schema_json)
 
-    return project.schema_cache
+    return Response(content=schema_json, media_type="application/json")
 
 
 @router.post("/{project_id}/bigquery/refresh")
@@ -221,26 +267,28 @@ async def refresh_schema(
     current_user: User = Depends(get_current_user),
 ):
     """Refresh BigQuery schema cache"""
-    project = db.query(Project).filter(
+    project = db.query(Project).options(raiseload("*")).filter(
         Project.id == project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     bigquery_service = BigQueryService(project_id=str(project_id), db_session=db)
 
     try:
+        await bigquery_service.materialize_metrics()
         schema = await bigquery_service.get_schema()
         project.schema_cache = schema
-        project.schema_last_updated = datetime.utcnow()
+        project.schema_last_updated = utc_now()
+        SemanticCache(db).invalidate(str(project_id))
 
         db.commit()
 
+        await set_cached_schema(str(project_id), schema)
+        await invalidate_project_queries(str(project_id))
+
         return {
             "status": "refreshed",
             "tables_found": len(schema),
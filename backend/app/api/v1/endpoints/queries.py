@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only, raiseload
 from typing import Optional
 from uuid import UUID
 
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.models import User, Project
 from app.schemas.query import QueryRequest, SQLExecuteRequest, QueryResponse
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, project_not_found, bigquery_not_configured
 from app.services.query_service import QueryService
+from app.core.responses import iter_query_response
 from app.core.logging import logger
 
 router = APIRouter()
@@ -27,23 +30,19 @@ async def ask_question(
     - Returns results with insights
     """
     # Verify user owns the project
-    project = db.query(Project).filter(
+    project = db.query(Project).options(
+        load_only(Project.id, Project.credentials_encrypted), raiseload("*")
+    ).filter(
         Project.id == query_request.project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     # Verify BigQuery is configured
     if not project.credentials_encrypted:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="BigQuery not configured for this project",
-        )
+        raise bigquery_not_configured()
 
     # Get client IP and user agent
     client_ip = request.client.host
@@ -57,7 +56,7 @@ async def ask_question(
             project_id=str(query_request.project_id),
             user_id=str(current_user.id),
             question=query_request.question,
-            conversation_id=str(query_request.conversation_id) if query_request.conversation_id else None,
+            conversation_id=query_request.conversation_id,
             model=query_request.model,
             ip_address=client_ip,
             user_agent=user_agent,
@@ -69,7 +68,8 @@ async def ask_question(
                 detail=result["error"],
             )
 
-        return result
+        # Rows are encoded chunk by chunk rather than into one response buffer
+        return StreamingResponse(iter_query_response(result), media_type="application/json")
 
     except HTTPException:
         raise
@@ -81,6 +81,61 @@ async def ask_question(
         )
 
 
+@router.post("/ask/stream")
+async def ask_question_stream(
+    query_request: QueryRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Streaming variant of /ask
+    - Returns NDJSON: the generated SQL, then result rows page by page,
+      then a final summary line (or an error line)
+    """
+    # Verify user owns the project
+    project = db.query(Project).options(
+        load_only(Project.id, Project.credentials_encrypted), raiseload("*")
+    ).filter(
+        Project.id == query_request.project_id,
+        Project.owner_id == current_user.id,
+    ).first()
+
+    if not project:
+        raise project_not_found()
+
+    # Verify BigQuery is configured
+    if not project.credentials_encrypted:
+        raise bigquery_not_configured()
+
+    project_id = str(query_request.project_id)
+    user_id = str(current_user.id)
+    conversation_id = query_request.conversation_id
+    client_ip = request.client.host
+    user_agent = request.headers.get("user-agent")
+
+    async def ndjson_lines():
+        # The stream outlives the request's dependencies, so it owns a
+        # session of its own
+        stream_db = SessionLocal()
+        try:
+            query_service = QueryService(db_session=stream_db)
+            async for line in query_service.stream_question(
+                project_id=project_id,
+                user_id=user_id,
+                question=query_request.question,
+                conversation_id=conversation_id,
+                model=query_request.model,
+                ip_address=client_ip,
+                user_agent=user_agent,
+            ):
+                yield line
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @router.post("/execute-sql")
 async def execute_sql(
     sql_request: SQLExecuteRequest,
@@ -95,16 +150,13 @@ async def execute_sql(
     - API integrations
     """
     # Verify user owns the project
-    project = db.query(Project).filter(
+    project = db.query(Project).options(load_only(Project.id), raiseload("*")).filter(
         Project.id == sql_request.project_id,
         Project.owner_id == current_user.id,
     ).first()
 
     if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found",
-        )
+        raise project_not_found()
 
     # Execute SQL
     query_service = QueryService(db_session=db)
@@ -114,7 +166,7 @@ async def execute_sql(
             project_id=str(sql_request.project_id),
             user_id=str(current_user.id),
             sql=sql_request.sql,
-            conversation_id=str(sql_request.conversation_id) if sql_request.conversation_id else None,
+            conversation_id=sql_request.conversation_id,
         )
 
         if result["error"]:
@@ -123,7 +175,8 @@ async def execute_sql(
                 detail=result["error"],
             )
 
-        return result
+        # Rows are encoded chunk by chunk rather than into one response buffer
+        return StreamingResponse(iter_query_response(result), media_type="application/json")
 
     except HTTPException:
         raise
@@ -146,14 +199,25 @@ async def get_query_history(
     """Get query history for user"""
     from app.models import QueryLog
 
-    query = db.query(QueryLog).filter(QueryLog.user_id == current_user.id)
+    query = db.query(QueryLog, func.count().over().label("total")).filter(
+        QueryLog.user_id == current_user.id
+    )
 
     if project_id:
         query = query.filter(QueryLog.project_id == project_id)
 
-    logs = query.order_by(QueryLog.created_at.desc()).limit(limit).offset(offset).all()
+    # Total comes back alongside each row, saving a separate COUNT query
+    rows = query.order_by(QueryLog.created_at.desc()).limit(limit).offset(offset).all()
+
+    if rows:
+        total = rows[0].total
+    elif offset:
+        # Paged past the end: no row carries the total
+        total = query.with_entities(func.count(QueryLog.id)).order_by(None).scalar()
+    else:
+        total = 0
 
     return {
-        "total": query.count(),
-        "logs": logs,
+        "total": total,
+        "logs": [row.QueryLog for row in rows],
     }
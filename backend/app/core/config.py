@@ -1,5 +1,7 @@
 from typing import List, Optional
-from pydantic_settings import BaseSettings
+from functools import lru_cache
+import os
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import validator
 import secrets
 
@@ -16,9 +18,18 @@ class Settings(BaseSettings):
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    # One async worker per CPU; ignored when DEBUG (reload) is on. Each worker has its
+    # own DB pool, so peak Postgres connections = WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    WORKERS: int = os.cpu_count() or 1
 
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_USE_PGBOUNCER: bool = False  # Disable client-side pooling behind PgBouncer
+    QUERY_LOG_BATCH_SIZE: int = 500  # Max query logs per bulk insert
+    QUERY_LOG_FLUSH_INTERVAL: float = 0.1  # Seconds a partial batch waits for more logs
 
     # Security
     SECRET_KEY: str = secrets.token_urlsafe(32)
@@ -29,9 +40,26 @@ class Settings(BaseSettings):
     # Anthropic
     ANTHROPIC_API_KEY: str
 
+    # BigQuery
+    MAX_BYTES_PER_QUERY: int = 10 * 1024**3  # Dry-run estimate above this is rejected
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Query caching (Redis)
+    QUERY_CACHE_TTL_SECONDS: int = 300  # BigQuery results by SQL
+    QUESTION_CACHE_TTL_SECONDS: int = 3600  # Generated SQL by normalized question
+
+    # Semantic cache (pgvector): near-duplicate questions reuse earlier answers.
+    # Off by default: needs the pgvector 0.7+ extension (see README) and loads an
+    # embedding model in every worker
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    SEMANTIC_CACHE_DIMENSIONS: int = 384  # Must match the model's output size
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Minimum cosine similarity for a hit
+    SEMANTIC_CACHE_TTL_DAYS: int = 7
+    SEMANTIC_CACHE_MAX_ROWS: int = 1000  # Larger results aren't stored in the cache
+
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
@@ -50,6 +78,7 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_DAY: int = 1000
+    API_KEY_MISS_LIMIT_PER_MINUTE: int = 10  # Unknown API keys per client IP
 
     # Sentry
     SENTRY_DSN: Optional[str] = None
@@ -64,9 +93,13 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(",")]
         return v
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, frozen=True)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings instance"""
+    return Settings()
 
 
-settings = Settings()
+settings = get_settings()
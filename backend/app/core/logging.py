@@ -16,6 +16,9 @@ logger.add(
     colorize=True,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
     level=settings.LOG_LEVEL,
+    enqueue=True,  # Write from a background thread, not the request path
+    backtrace=False,
+    diagnose=False,  # Don't walk frame locals when formatting exceptions
 )
 
 # Add file logger
@@ -26,6 +29,9 @@ logger.add(
     compression="zip",
     format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
     level=settings.LOG_LEVEL,
+    enqueue=True,
+    backtrace=False,
+    diagnose=False,
 )
 
 # Export configured logger
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from typing import Any, Dict, Iterator
+from uuid import UUID
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _orjson_default(obj: Any) -> Any:
+    """Serialize types orjson doesn't handle natively (e.g. BigQuery NUMERIC)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    if isinstance(obj, UUID):
+        # orjson only handles uuid.UUID itself, not subclasses (e.g. uuid6's uuid7)
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def json_dumps(content: Any) -> bytes:
+    """Encode content the same way API responses are encoded"""
+    return orjson.dumps(
+        content,
+        default=_orjson_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC,
+    )
+
+
+# Result rows encoded per chunk when streaming a query response body
+ROWS_CHUNK_SIZE = 1000
+
+
+def _object_members(obj: Dict[str, Any]) -> bytes:
+    """Encoded members of a JSON object, without the surrounding braces"""
+    return json_dumps(obj)[1:-1]
+
+
+def iter_query_response(content: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Encode a query response ({..., "result": {"rows": [...], ...}}) as JSON
+    incrementally, so a large result is never held as one encoded buffer
+    """
+    result = content.get("result")
+    rows = result.get("rows") if result else None
+    if not rows:
+        yield json_dumps(content)
+        return
+
+    # Assemble the envelope around the rows explicitly:
+    # {<other keys>,"result":{"rows":[<chunks>],<other result keys>}}
+    envelope = _object_members({k: v for k, v in content.items() if k != "result"})
+    result_rest = _object_members({k: v for k, v in result.items() if k != "rows"})
+
+    yield b"{" + (envelope + b"," if envelope else b"") + b'"result":{"rows":['
+    for start in range(0, len(rows), ROWS_CHUNK_SIZE):
+        chunk = json_dumps(rows[start : start + ROWS_CHUNK_SIZE])[1:-1]
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]" + (b"," + result_rest if result_rest else b"") + b"}}"
+
+
+class AppJSONResponse(ORJSONResponse):
+    """Default response class: orjson encoding with naive datetimes treated as UTC"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
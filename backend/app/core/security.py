@@ -1,24 +1,64 @@
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from jose import JWTError, jwt
+import jwt
 from passlib.context import CryptContext
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from fastapi import HTTPException, status
+import hashlib
 import secrets
 
 from app.core.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (Argon2id with OWASP-recommended parameters)
+password_hasher = PasswordHasher(time_cost=1, memory_cost=46 * 1024, parallelism=1)
+
+# API keys are high-entropy, so a lighter Argon2id profile is enough
+api_key_hasher = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+
+# Legacy bcrypt hashes are still accepted and upgraded to Argon2id on login
+legacy_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+ARGON2_HASH_PREFIX = "$argon2"
+
+
+# Error responses are built per raise: a shared instance would keep the
+# previous request's exception context (and its frames) alive
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+# JWT signing/verification inputs, resolved once at import time
+_jwt_key = settings.SECRET_KEY
+_jwt_algorithms = (settings.ALGORITHM,)
+_jwt_decode_options = {"require": ["exp", "sub"], "verify_aud": False}
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if not hashed_password.startswith(ARGON2_HASH_PREFIX):
+        return legacy_pwd_context.verify(plain_password, hashed_password)
+
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash is legacy bcrypt or uses outdated Argon2 parameters"""
+    if not hashed_password.startswith(ARGON2_HASH_PREFIX):
+        return True
+    return password_hasher.check_needs_rehash(hashed_password)
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -31,7 +71,7 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _jwt_key, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
@@ -40,21 +80,19 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _jwt_key, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
 def decode_token(token: str) -> Dict[str, Any]:
     """Decode and verify JWT token"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+        payload = jwt.decode(
+            token, _jwt_key, algorithms=_jwt_algorithms, options=_jwt_decode_options
         )
+        return payload
+    except jwt.InvalidTokenError:
+        raise credentials_exception()
 
 
 def generate_api_key() -> str:
@@ -62,11 +100,16 @@ def generate_api_key() -> str:
     return f"ttd_{secrets.token_urlsafe(32)}"
 
 
+def api_key_lookup_digest(api_key: str) -> bytes:
+    """Fixed-size digest of the full API key, used as its indexed lookup value"""
+    return hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+
+
 def hash_api_key(api_key: str) -> str:
     """Hash an API key for storage"""
-    return get_password_hash(api_key)
+    return api_key_hasher.hash(api_key)
 
 
 def verify_api_key(plain_key: str, hashed_key: str) -> bool:
-    """Verify an API key against its hash"""
+    """Verify an API key against its hash (Argon2 parameters are read from the hash)"""
     return verify_password(plain_key, hashed_key)
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, func
 
 # Naming convention for constraints
 convention = {
@@ -12,3 +12,8 @@ convention = {
 
 metadata = MetaData(naming_convention=convention)
 Base = declarative_base(metadata=metadata)
+
+
+def utc_now():
+    """Current time as naive UTC, evaluated by the database (same values as datetime.utcnow)"""
+    return func.timezone("utc", func.now())
@@ -1,27 +1,115 @@
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from contextvars import ContextVar, Token
+from typing import Any, Generator, Optional
+import orjson
+import psycopg2.extras
 
 from app.core.config import settings
+from app.core.responses import json_dumps
+
+# libpq TCP keepalives detect dead connections without a per-checkout pre-ping
+KEEPALIVE_CONNECT_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+
+def _json_serializer(value: Any) -> str:
+    """JSON/JSONB bind values: orjson, with the same type handling as API responses"""
+    return json_dumps(value).decode()
+
+
+# psycopg2 parses json/jsonb results itself; have it use orjson as well
+psycopg2.extras.register_default_json(globally=True, loads=orjson.loads)
+psycopg2.extras.register_default_jsonb(globally=True, loads=orjson.loads)
 
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-    echo=settings.DEBUG,
-)
+if settings.DB_USE_PGBOUNCER:
+    # PgBouncer (transaction pooling) already multiplexes connections
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=NullPool,
+        connect_args=KEEPALIVE_CONNECT_ARGS,
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        json_serializer=_json_serializer,
+        echo=settings.DEBUG,
+    )
+else:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args=KEEPALIVE_CONNECT_ARGS,
+        # Bulk inserts (e.g. buffered query logs) go out as multi-row batches
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        json_serializer=_json_serializer,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=settings.DEBUG,
+    )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+class RequestSessionScope:
+    """Holds the single lazily-created session shared by everything in one request"""
+
+    __slots__ = ("session",)
+
+    def __init__(self):
+        self.session: Optional[Session] = None
+
+
+# The scope object is mutable so sessions created in threadpool dependencies
+# are still visible to the middleware that closes them
+_request_session: ContextVar[Optional[RequestSessionScope]] = ContextVar(
+    "db_session", default=None
+)
+
+
+def open_request_scope() -> Token:
+    """Start a request scope; pass the returned token to close_request_scope()"""
+    return _request_session.set(RequestSessionScope())
+
+
+def close_request_scope(token: Token) -> None:
+    """Close the request's session (if one was opened) and reset the scope"""
+    scope = _request_session.get()
+    try:
+        if scope is not None and scope.session is not None:
+            scope.session.close()
+    finally:
+        _request_session.reset(token)
+
+
+def get_request_session() -> Optional[Session]:
+    """Return the current request's session, creating it on first use"""
+    scope = _request_session.get()
+    if scope is None:
+        return None
+
+    if scope.session is None:
+        scope.session = SessionLocal()
+    return scope.session
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency that provides a database session
     Usage: db: Session = Depends(get_db)
+    Reuses the request-scoped session when SessionCleanupMiddleware is active
     """
+    db = get_request_session()
+    if db is not None:
+        yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
@@ -1,11 +1,40 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 from fastapi.responses import JSONResponse
+from prometheus_client import make_asgi_app
 import uvicorn
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.responses import AppJSONResponse
 from app.api.v1.api import api_router
+from app.db.session import open_request_scope, close_request_scope
+from app.services.query_log_buffer import query_log_buffer
+from app.services import background_writes
+from app.services.bigquery.bigquery_service import shutdown_executor as shutdown_bigquery_executor
+
+
+class SessionCleanupMiddleware:
+    """
+    Share one DB session per request and close it once the response has been sent
+    Plain ASGI, so requests don't pay for BaseHTTPMiddleware's extra task and stream
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = open_request_scope()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            close_request_scope(token)
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -15,15 +44,19 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=AppJSONResponse,
 )
 
+# Request-scoped DB session
+app.add_middleware(SessionCleanupMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["authorization", "content-type", "x-api-key"],
 )
 
 
@@ -53,6 +86,9 @@ async def root():
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+# Prometheus metrics (cache hit/miss counters, ...)
+app.mount("/metrics", make_asgi_app())
+
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -70,12 +106,16 @@ async def startup_event():
     logger.info(f"{settings.APP_NAME} v{settings.APP_VERSION} starting up...")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
+    query_log_buffer.start()
 
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"{settings.APP_NAME} shutting down...")
+    await background_writes.drain()
+    await query_log_buffer.stop()
+    shutdown_bigquery_executor()
 
 
 if __name__ == "__main__":
@@ -83,6 +123,10 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
+        # Picks uvloop/httptools when installed (not available on Windows)
+        loop="auto",
+        http="auto",
+        workers=1 if settings.DEBUG else settings.WORKERS,
         reload=settings.DEBUG,
         log_level=settings.LOG_LEVEL.lower(),
     )
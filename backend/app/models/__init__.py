@@ -6,6 +6,7 @@ from app.models.memory import GlobalInstruction, ProjectMemory, ProjectInstructi
 from app.models.query_log import QueryLog
 from app.models.api_usage import APIUsage, ErrorLog
 from app.models.api_key import APIKey
+from app.models.semantic_cache import SemanticCacheEntry
 
 __all__ = [
     "Base",
@@ -20,4 +21,5 @@ __all__ = [
     "APIUsage",
     "ErrorLog",
     "APIKey",
+    "SemanticCacheEntry",
 ]
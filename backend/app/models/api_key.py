@@ -1,15 +1,25 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import (
+    Column, String, Integer, Boolean, DateTime, ForeignKey, JSON, Index, LargeBinary, text
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from datetime import datetime
 import uuid
 
-from app.db.base import Base
+from app.db.base import Base, utc_now
 
 
 class APIKey(Base):
     """API keys for programmatic access"""
     __tablename__ = "api_keys"
+    __table_args__ = (
+        # Keys created before key_lookup existed are still found by prefix;
+        # partial, so keys with a digest don't pay for the index
+        Index(
+            "ix_apikeys_prefix_legacy",
+            "key_prefix",
+            postgresql_where=text("key_lookup IS NULL"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -17,7 +27,8 @@ class APIKey(Base):
     # Key details
     name = Column(String(100), nullable=False)
     key_hash = Column(String(255), unique=True, nullable=False, index=True)
-    key_prefix = Column(String(10))  # First 8 chars for identification
+    key_prefix = Column(String(10))  # First 10 chars for identification
+    key_lookup = Column(LargeBinary(16), unique=True, index=True)  # api_key_lookup_digest()
 
     # Permissions
     scopes = Column(JSON, default=[])  # ['queries:execute', 'projects:read']
@@ -33,7 +44,7 @@ class APIKey(Base):
     # Expiry
     expires_at = Column(DateTime)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="api_keys")
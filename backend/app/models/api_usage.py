@@ -1,9 +1,8 @@
 from sqlalchemy import Column, String, Text, Integer, BigInteger, Boolean, DateTime, ForeignKey, JSON
 from sqlalchemy.dialects.postgresql import UUID, INET
-from datetime import datetime
 import uuid
 
-from app.db.base import Base
+from app.db.base import Base, utc_now
 
 
 class APIUsage(Base):
@@ -33,7 +32,7 @@ class APIUsage(Base):
     ip_address = Column(INET)
     user_agent = Column(Text)
 
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
 
 
 class ErrorLog(Base):
@@ -61,4 +60,4 @@ class ErrorLog(Base):
     resolved_at = Column(DateTime)
     resolved_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
 
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False, index=True)
@@ -6,6 +6,8 @@ import uuid
 
 from app.db.base import Base
 
+SQL_MESSAGE_TEMPLATE = "Generated SQL:\n```sql\n{sql}\n```"
+
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -30,8 +32,17 @@ class Message(Base):
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user', 'assistant', 'system'
     content = Column(Text, nullable=False)  # JSON string for complex content
+    # 'text', or 'sql' for raw generated SQL (rendered as a code block on read)
+    content_type = Column(String(20), nullable=False, default="text", server_default="text")
     tokens_used = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
+
+    @property
+    def rendered_content(self) -> str:
+        """Content as shown to users (raw SQL is stored without the markdown)"""
+        if self.content_type == "sql":
+            return SQL_MESSAGE_TEMPLATE.format(sql=self.content)
+        return self.content
@@ -1,10 +1,9 @@
 from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from datetime import datetime
 import uuid
 
-from app.db.base import Base
+from app.db.base import Base, utc_now
 
 
 class GlobalInstruction(Base):
@@ -16,8 +15,8 @@ class GlobalInstruction(Base):
     category = Column(String(100))  # 'sql_safety', 'optimization', 'formatting'
     priority = Column(Integer, default=0)  # Lower number = higher priority
     active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
 
 class ProjectMemory(Base):
@@ -30,8 +29,8 @@ class ProjectMemory(Base):
     key = Column(String(255), nullable=False)  # e.g., "revenue_calculation"
     content = Column(Text, nullable=False)  # e.g., "Revenue = gross_sales - returns"
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
     # Relationships
     project = relationship("Project", back_populates="project_memory")
@@ -46,8 +45,8 @@ class ProjectInstruction(Base):
     instruction_text = Column(Text, nullable=False)
     priority = Column(Integer, default=0)
     active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now(), nullable=False)
 
     # Relationships
     project = relationship("Project", back_populates="project_instructions")
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 
@@ -9,6 +9,10 @@ from app.db.base import Base
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Serves the "id = ? AND owner_id = ?" ownership check used by every endpoint
+        Index("ix_projects_owner_id_id", "owner_id", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -18,10 +22,11 @@ class Project(Base):
     # BigQuery connection
     bigquery_project_id = Column(String(255))
     bigquery_dataset = Column(String(255))
-    credentials_encrypted = Column(Text)  # Encrypted service account JSON
+    # Large columns are deferred: loaded only when accessed or explicitly undeferred
+    credentials_encrypted = deferred(Column(Text))  # Encrypted service account JSON
 
-    # Schema cache (JSON)
-    schema_cache = Column(JSON, default={})
+    # Schema cache (JSONB, stored parsed so reads skip Postgres-side JSON parsing)
+    schema_cache = deferred(Column(JSONB, default=dict))
     schema_last_updated = Column(DateTime)
 
     created_at = Column(DateTime, default=datetime.utcnow)
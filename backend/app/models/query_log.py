@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Text, Integer, BigInteger, DateTime, ForeignKey
+from sqlalchemy import (
+    Column, String, Text, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, text, false
+)
 from sqlalchemy.dialects.postgresql import UUID, INET
 from datetime import datetime
-import uuid
+from uuid6 import uuid7
 
 from app.db.base import Base
 
@@ -9,8 +11,15 @@ from app.db.base import Base
 class QueryLog(Base):
     """Comprehensive query logging for admin dashboard"""
     __tablename__ = "query_logs"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        Index("ix_query_logs_user_project_created", "user_id", "project_id", "created_at"),
+        Index("ix_query_logs_project_created", "project_id", text("created_at DESC")),
+        # Append-only timestamps: a tiny BRIN index covers time-range scans
+        Index("ix_query_logs_created_brin", "created_at", postgresql_using="brin"),
+    )
+
+    # Time-ordered ids keep primary key inserts at the right edge of the B-tree
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
     conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"))
@@ -22,12 +31,15 @@ class QueryLog(Base):
     generated_sql = Column(Text)
     sql_generation_time_ms = Column(Integer)
     sql_tokens_used = Column(Integer)
+    cache_read_tokens = Column(Integer)  # Prompt tokens served from Anthropic's prompt cache
+    cache_creation_tokens = Column(Integer)  # Prompt tokens written to the prompt cache
 
     # Execution
     execution_status = Column(String(20))  # 'success', 'failed', 'timeout'
     execution_time_ms = Column(Integer)
     rows_returned = Column(Integer)
     bytes_processed = Column(BigInteger)  # BigQuery bytes scanned
+    cache_hit = Column(Boolean, default=False, server_default=false(), nullable=False)
 
     # Errors
     error_message = Column(Text)
@@ -41,4 +53,4 @@ class QueryLog(Base):
     ip_address = Column(INET)
     user_agent = Column(Text)
 
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from pgvector.sqlalchemy import HALFVEC
+import uuid
+
+from app.db.base import Base, utc_now
+from app.core.config import settings
+
+
+class SemanticCacheEntry(Base):
+    """Answered questions with their embeddings, for near-duplicate lookups"""
+    __tablename__ = "query_cache"
+    __table_args__ = (
+        # Approximate nearest neighbour search by cosine distance (pgvector)
+        Index(
+            "ix_query_cache_embedding",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+        ),
+        Index("ix_query_cache_project_user_created", "project_id", "user_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(
+        UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Half precision: half the size of vector(n) in the table and the index,
+    # with no measurable effect on cosine similarity at the cache threshold
+    embedding = Column(HALFVEC(settings.SEMANTIC_CACHE_DIMENSIONS), nullable=False)
+    question = Column(Text, nullable=False)
+    sql = Column(Text, nullable=False)
+    response = Column(JSONB, nullable=False)  # sql, result, insights, suggested_chart
+
+    created_at = Column(DateTime, server_default=utc_now(), nullable=False)
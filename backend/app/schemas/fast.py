@@ -0,0 +1,34 @@
+from typing import Any, List, Type, TypeVar, Union
+from pydantic import BaseModel
+
+from app.core.responses import AppJSONResponse
+
+# Fast path for turning trusted DB rows into responses. The Pydantic models
+# stay the documented response_model; routes build them with model_construct
+# and return a response directly so FastAPI doesn't re-validate.
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def construct_from_orm(model_type: Type[ModelT], obj: Any) -> ModelT:
+    """
+    Build a Pydantic response model from a trusted ORM object via model_construct
+    Only for *Response models - never for request schemas that see user input
+    """
+    values = {field: getattr(obj, field) for field in model_type.model_fields}
+    return model_type.model_construct(**values)
+
+
+def model_response(
+    model: Union[BaseModel, List[BaseModel]], status_code: int = 200
+) -> AppJSONResponse:
+    """
+    Serialize already-built response models (or a list of them), bypassing
+    response_model re-validation; encoded like every other response
+    (orjson, naive datetimes as UTC)
+    """
+    if isinstance(model, list):
+        content = [item.model_dump() for item in model]
+    else:
+        content = model.model_dump()
+    return AppJSONResponse(content=content, status_code=status_code)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -22,6 +22,8 @@ class SQLExecuteRequest(BaseModel):
 
 class QueryResult(BaseModel):
     """Query execution result"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     sql: str
     rows: List[Dict[str, Any]]
     schema: List[Dict[str, str]]  # [{"name": "col1", "type": "STRING"}, ...]
@@ -32,6 +34,8 @@ class QueryResult(BaseModel):
 
 class QueryResponse(BaseModel):
     """Complete query response"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     query_id: UUID
     sql: str
     result: Optional[QueryResult] = None
@@ -62,5 +66,4 @@ class SavedQueryResponse(BaseModel):
     is_template: bool
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, extra="ignore", frozen=True)
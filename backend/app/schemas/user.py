@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional, Dict, Any
 from datetime import datetime
 from uuid import UUID
@@ -32,11 +32,12 @@ class UserResponse(UserBase):
     preferences: Dict[str, Any]
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, extra="ignore", frozen=True)
 
 
 class TokenResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
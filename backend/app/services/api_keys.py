@@ -0,0 +1,37 @@
+from typing import List, Optional, Tuple
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy.orm import Session
+
+from app.models import APIKey
+from app.core.security import generate_api_key, hash_api_key, api_key_lookup_digest
+
+# Plaintext characters stored in key_prefix (legacy lookup, identification)
+API_KEY_PREFIX_LENGTH = 10
+
+
+def create_api_key(
+    db: Session,
+    user_id: UUID,
+    name: str,
+    scopes: Optional[List[str]] = None,
+    expires_at: Optional[datetime] = None,
+) -> Tuple[APIKey, str]:
+    """
+    Create and commit an API key for a user
+    Returns the row and the plaintext key (only available now; store hashes only)
+    """
+    plain_key = generate_api_key()
+    api_key = APIKey(
+        user_id=user_id,
+        name=name,
+        key_hash=hash_api_key(plain_key),
+        key_prefix=plain_key[:API_KEY_PREFIX_LENGTH],
+        key_lookup=api_key_lookup_digest(plain_key),
+        scopes=scopes or [],
+        expires_at=expires_at,
+    )
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    return api_key, plain_key
@@ -0,0 +1,37 @@
+from typing import Any, Callable, Set
+import asyncio
+
+from app.db.session import engine
+from app.core.logging import logger
+
+# Strong references keep pending tasks alive until they finish
+_pending: Set[asyncio.Task] = set()
+
+
+def _in_transaction(write: Callable[..., None], *args: Any) -> None:
+    with engine.begin() as connection:
+        write(connection, *args)
+
+
+async def _run(write: Callable[..., None], *args: Any) -> None:
+    try:
+        await asyncio.to_thread(_in_transaction, write, *args)
+    except Exception as e:
+        logger.error(f"Background write {write.__name__} failed: {str(e)}")
+
+
+def write_in_background(write: Callable[..., None], *args: Any) -> None:
+    """
+    Run write(connection, *args) in its own transaction on a worker thread,
+    without waiting for it (call from the running event loop)
+    """
+    task = asyncio.create_task(_run(write, *args))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def drain() -> None:
+    """Wait for in-flight background writes (app shutdown)"""
+    if _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+
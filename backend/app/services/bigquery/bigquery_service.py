@@ -1,12 +1,101 @@
-from typing import Dict, Any, List, Optional
-import json
+from typing import Dict, Any, Callable, List, Optional, AsyncIterator, Tuple, TypeVar
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import hashlib
+import threading
 import time
-from google.cloud import bigquery
+import orjson
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery, bigquery_storage
 from google.oauth2 import service_account
-from sqlalchemy.orm import Session
+from requests.adapters import HTTPAdapter
+from sqlalchemy.orm import Session, undefer
 
 from app.models import Project
+from app.core.config import settings
 from app.core.logging import logger
+from app.services.cache.query_cache import get_cached_result, set_cached_result
+from app.services.bigquery.metrics import MetricAggregator, load_metric_definitions
+
+
+# Rows fetched per BigQuery page when streaming results
+STREAM_PAGE_SIZE = 1000
+
+# Blocking BigQuery calls run on this pool so they never stall the event loop;
+# its size caps concurrent BigQuery work per process
+BIGQUERY_MAX_WORKERS = 32
+_bigquery_executor = ThreadPoolExecutor(
+    max_workers=BIGQUERY_MAX_WORKERS, thread_name_prefix="bq"
+)
+
+T = TypeVar("T")
+
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking BigQuery call on the BigQuery thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bigquery_executor, func, *args)
+
+
+def shutdown_executor() -> None:
+    """Stop the BigQuery thread pool (app shutdown)"""
+    _bigquery_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Clients keyed by (bigquery project, credentials digest), shared across requests
+# so credential parsing, OAuth and HTTP/gRPC connection pools are reused
+CLIENT_CACHE_MAX_SIZE = 256
+CLIENT_CACHE_TTL_SECONDS = 3600
+BigQueryClients = Tuple[bigquery.Client, bigquery_storage.BigQueryReadClient]
+_client_cache: "OrderedDict[Tuple[str, str], Tuple[BigQueryClients, float]]" = OrderedDict()
+_client_cache_lock = threading.Lock()
+
+
+def _pooled_session(credentials: service_account.Credentials) -> AuthorizedSession:
+    """
+    Authorized HTTP session whose keep-alive pool matches the BigQuery thread pool;
+    the requests default (10) would drop and reopen TLS connections under load
+    """
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BIGQUERY_MAX_WORKERS)
+    session.mount("https://", adapter)
+    return session
+
+
+def _cached_client(bigquery_project_id: str, credentials_json: str) -> BigQueryClients:
+    """Get or build the BigQuery (and BigQuery Storage) clients for these credentials"""
+    key = (bigquery_project_id, hashlib.sha1(credentials_json.encode()).hexdigest())
+    now = time.time()
+
+    with _client_cache_lock:
+        entry = _client_cache.get(key)
+        if entry is not None and entry[1] > now:
+            _client_cache.move_to_end(key)
+            return entry[0]
+
+    credentials = service_account.Credentials.from_service_account_info(
+        orjson.loads(credentials_json),
+        scopes=bigquery.Client.SCOPE,
+    )
+    clients = (
+        bigquery.Client(
+            credentials=credentials,
+            project=bigquery_project_id,
+            _http=_pooled_session(credentials),
+        ),
+        # Arrow downloads otherwise build a new gRPC channel per query
+        bigquery_storage.BigQueryReadClient(credentials=credentials),
+    )
+
+    with _client_cache_lock:
+        _client_cache[key] = (clients, now + CLIENT_CACHE_TTL_SECONDS)
+        _client_cache.move_to_end(key)
+        while len(_client_cache) > CLIENT_CACHE_MAX_SIZE:
+            _client_cache.popitem(last=False)
+
+    return clients
 
 
 class BigQueryService:
@@ -16,6 +105,19 @@ class BigQueryService:
         self.project_id = project_id
         self.db = db_session
         self.client: Optional[bigquery.Client] = None
+        self.bqstorage_client: Optional[bigquery_storage.BigQueryReadClient] = None
+        self._project: Optional[Project] = None
+
+    def _get_project(self) -> Optional[Project]:
+        """Get the project row (with credentials), fetched once per service"""
+        if self._project is None:
+            self._project = (
+                self.db.query(Project)
+                .options(undefer(Project.credentials_encrypted))
+                .filter(Project.id == self.project_id)
+                .first()
+            )
+        return self._project
 
     def _get_client(self) -> bigquery.Client:
         """Get or create BigQuery client"""
@@ -23,33 +125,25 @@ class BigQueryService:
             return self.client
 
         # Get project from database
-        project = self.db.query(Project).filter(Project.id == self.project_id).first()
+        project = self._get_project()
 
         if not project or not project.credentials_encrypted:
             raise ValueError("BigQuery credentials not configured for this project")
 
         # Decrypt credentials (in production, you'd decrypt here)
         # For now, assuming credentials_encrypted contains the JSON string
-        credentials_dict = json.loads(project.credentials_encrypted)
-
-        # Create credentials object
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_dict
-        )
-
-        # Create client
-        self.client = bigquery.Client(
-            credentials=credentials,
-            project=project.bigquery_project_id,
+        self.client, self.bqstorage_client = _cached_client(
+            project.bigquery_project_id, project.credentials_encrypted
         )
 
         return self.client
 
     async def execute_query(
-        self, sql: str, timeout: int = 60
+        self, sql: str, timeout: int = 60, use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Execute a BigQuery SQL query
+        Results are served from the Redis query cache when the same SQL ran recently
 
         Returns:
             dict: {
@@ -60,50 +154,34 @@ class BigQueryService:
                 'bytes_processed': int
             }
         """
+        if use_cache:
+            cached = await get_cached_result(self.project_id, sql)
+            if cached is not None:
+                logger.debug("Query served from cache")
+                return cached
+
         start_time = time.time()
 
         try:
             client = self._get_client()
 
-            # Configure query job
-            job_config = bigquery.QueryJobConfig(
-                use_query_cache=True,
-                use_legacy_sql=False,
-            )
-
             # Execute query
-            logger.info(f"Executing BigQuery SQL: {sql[:200]}...")
-            query_job = client.query(sql, job_config=job_config, timeout=timeout)
-
-            # Wait for results
-            results = query_job.result()
-
-            # Convert to list of dicts
-            rows = []
-            for row in results:
-                rows.append(dict(row.items()))
-
-            # Get schema
-            schema = []
-            if results.schema:
-                for field in results.schema:
-                    schema.append({
-                        "name": field.name,
-                        "type": field.field_type,
-                    })
+            logger.debug("Executing BigQuery SQL: {:.200}...", sql)
+            rows, schema, bytes_processed = await run_blocking(
+                self._run_query, client, self.bqstorage_client, sql, timeout
+            )
 
             # Calculate execution time
             execution_time_ms = int((time.time() - start_time) * 1000)
 
-            # Get bytes processed
-            bytes_processed = query_job.total_bytes_processed or 0
-
             logger.info(
-                f"Query executed successfully. Rows: {len(rows)}, "
-                f"Time: {execution_time_ms}ms, Bytes: {bytes_processed}"
+                "Query executed successfully. Rows: {}, Time: {}ms, Bytes: {}",
+                len(rows),
+                execution_time_ms,
+                bytes_processed,
             )
 
-            return {
+            result = {
                 "rows": rows,
                 "schema": schema,
                 "rows_returned": len(rows),
@@ -111,11 +189,140 @@ class BigQueryService:
                 "bytes_processed": bytes_processed,
             }
 
+            if use_cache:
+                await set_cached_result(self.project_id, sql, result)
+
+            return result
+
         except Exception as e:
             execution_time_ms = int((time.time() - start_time) * 1000)
             logger.error(f"BigQuery execution failed: {str(e)}")
             raise Exception(f"Query execution failed: {str(e)}")
 
+    @classmethod
+    def _run_query(
+        cls,
+        client: bigquery.Client,
+        bqstorage_client: bigquery_storage.BigQueryReadClient,
+        sql: str,
+        timeout: int,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]], int]:
+        """Blocking part of execute_query: run the job and download the rows"""
+        cls._check_estimated_bytes(client, sql)
+
+        # Configure query job
+        job_config = bigquery.QueryJobConfig(
+            use_query_cache=True,
+            use_legacy_sql=False,
+            maximum_bytes_billed=settings.MAX_BYTES_PER_QUERY,
+        )
+
+        query_job = client.query(sql, job_config=job_config, timeout=timeout)
+
+        # Wait for results
+        results = query_job.result()
+
+        # Download as Arrow (BigQuery Storage API for large results) and
+        # convert to row dicts in one columnar pass
+        rows = results.to_arrow(bqstorage_client=bqstorage_client).to_pylist()
+
+        return rows, cls._result_schema(results), query_job.total_bytes_processed or 0
+
+    @staticmethod
+    def _check_estimated_bytes(client: bigquery.Client, sql: str) -> int:
+        """
+        Dry-run the SQL before running it for real
+        Invalid SQL fails here in milliseconds, and scans above
+        MAX_BYTES_PER_QUERY are rejected before any bytes are billed
+        """
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        estimated_bytes = client.query(sql, job_config=job_config).total_bytes_processed or 0
+
+        if estimated_bytes > settings.MAX_BYTES_PER_QUERY:
+            raise ValueError(
+                f"Query would process {estimated_bytes} bytes, "
+                f"above the {settings.MAX_BYTES_PER_QUERY} byte limit"
+            )
+
+        return estimated_bytes
+
+    async def stream_query(
+        self, sql: str, timeout: int = 60, page_size: int = STREAM_PAGE_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a BigQuery SQL query and yield results page by page
+
+        Yields:
+            dict: {'type': 'schema', 'schema': List[Dict]} once, then
+                  {'type': 'rows', 'rows': List[Dict]} per page, then
+                  {'type': 'stats', 'rows_returned': int,
+                   'execution_time_ms': int, 'bytes_processed': int}
+        """
+        start_time = time.time()
+
+        try:
+            client = self._get_client()
+
+            await run_blocking(self._check_estimated_bytes, client, sql)
+
+            job_config = bigquery.QueryJobConfig(
+                use_query_cache=True,
+                use_legacy_sql=False,
+                maximum_bytes_billed=settings.MAX_BYTES_PER_QUERY,
+            )
+
+            logger.debug("Streaming BigQuery SQL: {:.200}...", sql)
+            query_job = await run_blocking(
+                partial(client.query, sql, job_config=job_config, timeout=timeout)
+            )
+            results = await run_blocking(partial(query_job.result, page_size=page_size))
+
+            yield {"type": "schema", "schema": self._result_schema(results)}
+
+            rows_returned = 0
+            pages = iter(results.pages)
+            while True:
+                # Each page fetch is an HTTP round trip
+                page = await run_blocking(next, pages, None)
+                if page is None:
+                    break
+                rows = [dict(row.items()) for row in page]
+                rows_returned += len(rows)
+                yield {"type": "rows", "rows": rows}
+
+            execution_time_ms = int((time.time() - start_time) * 1000)
+            bytes_processed = query_job.total_bytes_processed or 0
+
+            logger.info(
+                "Query streamed successfully. Rows: {}, Time: {}ms, Bytes: {}",
+                rows_returned,
+                execution_time_ms,
+                bytes_processed,
+            )
+
+            yield {
+                "type": "stats",
+                "rows_returned": rows_returned,
+                "execution_time_ms": execution_time_ms,
+                "bytes_processed": bytes_processed,
+            }
+
+        except Exception as e:
+            logger.error(f"BigQuery streaming failed: {str(e)}")
+            raise Exception(f"Query execution failed: {str(e)}")
+
+    @staticmethod
+    def _result_schema(results) -> List[Dict[str, str]]:
+        """Column names and types of a query result"""
+        schema = []
+        if results.schema:
+            for field in results.schema:
+                schema.append({
+                    "name": field.name,
+                    "type": field.field_type,
+                })
+        return schema
+
     async def get_schema(self) -> Dict[str, Any]:
         """
         Extract schema from BigQuery dataset
@@ -131,22 +338,24 @@ class BigQueryService:
         """
         try:
             client = self._get_client()
-            project = self.db.query(Project).filter(Project.id == self.project_id).first()
+            project = self._get_project()
 
             if not project.bigquery_dataset:
                 raise ValueError("BigQuery dataset not configured")
 
             dataset_id = f"{project.bigquery_project_id}.{project.bigquery_dataset}"
-            dataset = client.get_dataset(dataset_id)
-
-            schema_info = {}
 
             # List all tables in dataset
-            tables = client.list_tables(dataset)
+            table_refs = await run_blocking(self._list_tables, client, dataset_id)
+
+            # Metadata fetches are independent round trips, so fan them out
+            tables = await asyncio.gather(
+                *(run_blocking(client.get_table, table_ref) for table_ref in table_refs)
+            )
 
-            for table_ref in tables:
-                table = client.get_table(table_ref)
+            schema_info = {}
 
+            for table in tables:
                 # Get columns
                 columns = []
                 for field in table.schema:
@@ -170,14 +379,52 @@ class BigQueryService:
             logger.error(f"Schema extraction failed: {str(e)}")
             raise Exception(f"Failed to extract schema: {str(e)}")
 
+    @staticmethod
+    def _list_tables(client: bigquery.Client, dataset_id: str) -> List[Any]:
+        """Blocking part of get_schema: list the table references of a dataset"""
+        dataset = client.get_dataset(dataset_id)
+        return list(client.list_tables(dataset))
+
+    async def materialize_metrics(self) -> List[str]:
+        """
+        Build materialized roll-ups for the project's registered metrics
+        Run before get_schema() so the views appear in the cached schema
+
+        Returns:
+            list: View ids that were created
+        """
+        definitions = load_metric_definitions(self.db, self.project_id)
+        if not definitions:
+            return []
+
+        client = self._get_client()
+        project = self._get_project()
+
+        if not project.bigquery_dataset:
+            raise ValueError("BigQuery dataset not configured")
+
+        aggregator = MetricAggregator(
+            client=client,
+            bigquery_project_id=project.bigquery_project_id,
+            dataset=project.bigquery_dataset,
+        )
+        for name, sql in definitions.items():
+            try:
+                aggregator.register(name, sql)
+            except ValueError as e:
+                # Rejected definitions are skipped; the others still materialize
+                logger.warning(str(e))
+
+        return await run_blocking(aggregator.materialize)
+
     async def test_connection(self) -> bool:
         """Test BigQuery connection"""
         try:
             client = self._get_client()
             # Try a simple query
             query = "SELECT 1 as test"
-            query_job = client.query(query, timeout=10)
-            query_job.result()
+            query_job = await run_blocking(partial(client.query, query, timeout=10))
+            await run_blocking(query_job.result)
             logger.info("BigQuery connection test successful")
             return True
         except Exception as e:
@@ -200,7 +447,7 @@ class BigQueryService:
 
             job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
 
-            query_job = client.query(sql, job_config=job_config)
+            query_job = await run_blocking(partial(client.query, sql, job_config=job_config))
 
             return {
                 "valid": True,
@@ -0,0 +1,117 @@
+from typing import Dict, List
+from datetime import timedelta
+import re
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+from sqlalchemy.orm import Session
+
+from app.models import ProjectMemory
+from app.services.bigquery.sql_safety import is_single_select, sql_is_dangerous
+from app.core.logging import logger
+
+# Roll-up views are named mv_<metric> so the schema context can flag them
+MATERIALIZED_VIEW_PREFIX = "mv_"
+
+# ProjectMemory rows of this type define metrics: key = name, content = SELECT
+METRIC_MEMORY_TYPE = "metric"
+
+_INVALID_NAME_CHARS_RE = re.compile(r"[^a-z0-9_]+")
+
+
+def load_metric_definitions(db: Session, project_id: str) -> Dict[str, str]:
+    """Load metric definitions stored as project memory"""
+    rows = (
+        db.query(ProjectMemory.key, ProjectMemory.content)
+        .filter(ProjectMemory.project_id == project_id)
+        .filter(ProjectMemory.memory_type == METRIC_MEMORY_TYPE)
+        .all()
+    )
+    return {key: content for key, content in rows}
+
+
+class MetricAggregator:
+    """
+    Pre-computes registered metrics into BigQuery materialized views
+    so repeat aggregate questions read a roll-up instead of raw tables
+    """
+
+    def __init__(
+        self,
+        client: bigquery.Client,
+        bigquery_project_id: str,
+        dataset: str,
+        refresh_interval_minutes: int = 60,
+    ):
+        self.client = client
+        self.bigquery_project_id = bigquery_project_id
+        self.dataset = dataset
+        self.refresh_interval_minutes = refresh_interval_minutes
+        self.metrics: Dict[str, str] = {}
+
+    def register(self, name: str, sql: str) -> None:
+        """
+        Register a metric by name with the SELECT that computes it
+        Raises ValueError unless sql is a single read-only SELECT: it is
+        pasted into DDL that runs with the project's service account
+        """
+        sql = sql.strip().rstrip(";").strip()
+        if ";" in sql or not is_single_select(sql) or sql_is_dangerous(sql):
+            raise ValueError(f"Metric {name} must be a single SELECT statement")
+        self.metrics[name] = sql
+
+    def view_id(self, name: str) -> str:
+        """Fully qualified materialized view name for a metric"""
+        view_name = _INVALID_NAME_CHARS_RE.sub("_", name.lower()).strip("_")
+        return f"{self.bigquery_project_id}.{self.dataset}.{MATERIALIZED_VIEW_PREFIX}{view_name}"
+
+    def materialize(self) -> List[str]:
+        """
+        Create (or replace) a materialized view per registered metric;
+        views already matching their definition are left untouched
+
+        Returns:
+            list: View ids that are in place (created or unchanged)
+        """
+        created = []
+
+        for name, sql in self.metrics.items():
+            view_id = self.view_id(name)
+            if self._is_current(view_id, sql):
+                # CREATE OR REPLACE would drop and fully recompute the view
+                created.append(view_id)
+                continue
+
+            ddl = (
+                f"CREATE OR REPLACE MATERIALIZED VIEW `{view_id}` "
+                f"OPTIONS (enable_refresh = true, "
+                f"refresh_interval_minutes = {self.refresh_interval_minutes}) "
+                f"AS {sql}"
+            )
+
+            try:
+                self.client.query(ddl).result()
+                created.append(view_id)
+            except Exception as e:
+                # One bad definition shouldn't block the others
+                logger.error(f"Materializing metric {name} failed: {str(e)}")
+
+        logger.info(f"Materialized {len(created)} of {len(self.metrics)} metrics")
+        return created
+
+    def _is_current(self, view_id: str, sql: str) -> bool:
+        """Whether the view already exists with this definition and refresh interval"""
+        try:
+            view = self.client.get_table(view_id)
+        except NotFound:
+            return False
+        except Exception as e:
+            logger.warning(f"Reading materialized view {view_id} failed: {str(e)}")
+            return False
+
+        refresh_interval = view.mview_refresh_interval
+        return (
+            (view.mview_query or "").strip() == sql
+            and view.mview_enable_refresh is True
+            and refresh_interval is not None
+            and refresh_interval == timedelta(minutes=self.refresh_interval_minutes)
+        )
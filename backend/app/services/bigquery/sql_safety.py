@@ -0,0 +1,24 @@
+from functools import lru_cache
+import re
+import sqlparse
+
+# Whole keywords only, so columns like created_at or updated_by don't match
+_DANGEROUS_SQL_RE = re.compile(
+    r"\b(?:DROP|DELETE|TRUNCATE|ALTER|CREATE|UPDATE|INSERT|MERGE|GRANT|REVOKE)\b",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=4096)
+def sql_is_dangerous(sql: str) -> bool:
+    """Check for dangerous SQL operations"""
+    # Memoized: the same SQL recurs (reruns, cached generations, /execute-sql edits)
+    return _DANGEROUS_SQL_RE.search(sql) is not None
+
+
+def is_single_select(sql: str) -> bool:
+    """True if sql is exactly one SELECT (or WITH ... SELECT) statement"""
+    statements = [
+        statement for statement in sqlparse.parse(sql) if str(statement).strip(" \t\r\n;")
+    ]
+    return len(statements) == 1 and statements[0].get_type() == "SELECT"
@@ -0,0 +1,96 @@
+from typing import Any, Dict, Optional
+import hashlib
+import re
+import orjson
+
+from app.db.redis import redis_client
+from app.core.config import settings
+from app.core.responses import json_dumps
+from app.core.logging import logger
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Trim surrounding whitespace and a trailing ';' only: case and spacing
+    inside the query (e.g. in string literals) change its result
+    """
+    return sql.strip().rstrip(";").rstrip()
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercase and collapse whitespace: 'Q1  Revenue?' -> 'q1 revenue?'
+    Operators, signs and punctuation are kept ('> 100' and '< 100' differ)
+    """
+    return _WHITESPACE_RE.sub(" ", question.strip()).lower()
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+def _result_key(project_id: str, sql: str) -> str:
+    return f"proj:{project_id}:qres:{_digest(normalize_sql(sql))}"
+
+
+def _sql_key(project_id: str, model: str, memory: str, question: str) -> str:
+    # The memory text is part of the prompt: editing rules/instructions changes the key
+    return f"proj:{project_id}:qsql:{_digest(model, memory, normalize_question(question))}"
+
+
+async def get_cached_result(project_id: str, sql: str) -> Optional[Dict[str, Any]]:
+    """Get a cached BigQuery result for this SQL, if still fresh"""
+    try:
+        cached = await redis_client.get(_result_key(project_id, sql))
+    except Exception as e:
+        logger.warning(f"Query result cache read failed: {str(e)}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+
+async def set_cached_result(project_id: str, sql: str, result: Dict[str, Any]) -> None:
+    """Cache a BigQuery result for QUERY_CACHE_TTL_SECONDS"""
+    try:
+        await redis_client.set(
+            _result_key(project_id, sql), json_dumps(result), ex=settings.QUERY_CACHE_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"Query result cache write failed: {str(e)}")
+
+
+async def get_cached_sql(
+    project_id: str, model: str, memory: str, question: str
+) -> Optional[str]:
+    """Get previously generated SQL for an equivalent question under the same memory"""
+    try:
+        cached = await redis_client.get(_sql_key(project_id, model, memory, question))
+    except Exception as e:
+        logger.warning(f"Question cache read failed: {str(e)}")
+        return None
+    return cached.decode() if cached is not None else None
+
+
+async def set_cached_sql(
+    project_id: str, model: str, memory: str, question: str, sql: str
+) -> None:
+    """Remember the SQL generated for a question"""
+    try:
+        await redis_client.set(
+            _sql_key(project_id, model, memory, question),
+            sql,
+            ex=settings.QUESTION_CACHE_TTL_SECONDS,
+        )
+    except Exception as e:
+        logger.warning(f"Question cache write failed: {str(e)}")
+
+
+async def invalidate_project_queries(project_id: str) -> None:
+    """Drop every cached result and question->SQL mapping for a project"""
+    try:
+        for kind in ("qres", "qsql"):
+            async for key in redis_client.scan_iter(match=f"proj:{project_id}:{kind}:*"):
+                await redis_client.delete(key)
+    except Exception as e:
+        logger.warning(f"Query cache invalidation failed: {str(e)}")
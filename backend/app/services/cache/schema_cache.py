@@ -0,0 +1,54 @@
+from typing import Any, Dict, Optional, Union
+import orjson
+
+from app.db.redis import redis_client
+from app.core.logging import logger
+
+SCHEMA_CACHE_TTL_SECONDS = 86400
+
+
+def _schema_key(project_id: str) -> str:
+    return f"proj:{project_id}:schema"
+
+
+async def get_cached_schema_json(project_id: str) -> Optional[bytes]:
+    """
+    Get a project's BigQuery schema as raw JSON bytes from Redis
+    Returns None on a miss or if Redis is unavailable
+    """
+    try:
+        return await redis_client.get(_schema_key(project_id))
+    except Exception as e:
+        logger.warning(f"Schema cache read failed: {str(e)}")
+        return None
+
+
+async def get_cached_schema(project_id: str) -> Optional[Dict[str, Any]]:
+    """Get a project's BigQuery schema from Redis, decoded"""
+    schema_json = await get_cached_schema_json(project_id)
+    if schema_json is None:
+        return None
+    return orjson.loads(schema_json)
+
+
+async def set_cached_schema_json(project_id: str, schema_json: Union[bytes, str]) -> None:
+    """Store a project's BigQuery schema, already encoded as JSON, in Redis"""
+    try:
+        await redis_client.set(
+            _schema_key(project_id), schema_json, ex=SCHEMA_CACHE_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"Schema cache write failed: {str(e)}")
+
+
+async def set_cached_schema(project_id: str, schema: Dict[str, Any]) -> None:
+    """Store a project's BigQuery schema in Redis"""
+    await set_cached_schema_json(project_id, orjson.dumps(schema))
+
+
+async def invalidate_cached_schema(project_id: str) -> None:
+    """Drop a project's cached BigQuery schema"""
+    try:
+        await redis_client.delete(_schema_key(project_id))
+    except Exception as e:
+        logger.warning(f"Schema cache invalidation failed: {str(e)}")
@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+from functools import lru_cache
+import asyncio
+from prometheus_client import Counter
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import SemanticCacheEntry
+from app.core.config import settings
+from app.core.logging import logger
+
+CACHE_HITS = Counter("cache_hits_total", "Questions answered from the semantic cache")
+CACHE_MISSES = Counter("cache_misses_total", "Questions not found in the semantic cache")
+
+
+@lru_cache(maxsize=1)
+def _get_model():
+    """Load the embedding model once per process, on first use"""
+    # Heavy import (torch), so only paid when the cache is actually used
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(settings.SEMANTIC_CACHE_MODEL)
+
+
+def _embed(text: str) -> List[float]:
+    # Normalized vectors: cosine similarity is 1 - cosine distance
+    return _get_model().encode(text, normalize_embeddings=True).tolist()
+
+
+class SemanticCache:
+    """
+    Answers repeat and near-duplicate questions (per project and user)
+    from earlier responses, matched by embedding similarity
+    """
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    async def embed(self, question: str) -> Optional[List[float]]:
+        """Embed a question off the event loop; None if the model is unavailable"""
+        try:
+            return await asyncio.to_thread(_embed, question)
+        except Exception as e:
+            logger.warning(f"Question embedding failed: {str(e)}")
+            return None
+
+    def lookup(
+        self, project_id: str, user_id: str, embedding: List[float]
+    ) -> Optional[Dict[str, Any]]:
+        """Get the stored response of the most similar recent question, if close enough"""
+        distance = SemanticCacheEntry.embedding.cosine_distance(embedding)
+        cutoff = datetime.utcnow() - timedelta(days=settings.SEMANTIC_CACHE_TTL_DAYS)
+
+        try:
+            # Savepoint: a failed read rolls back only itself, not the caller's work
+            with self.db.begin_nested():
+                match = (
+                    self.db.query(SemanticCacheEntry.response, distance.label("distance"))
+                    .filter(
+                        SemanticCacheEntry.project_id == project_id,
+                        SemanticCacheEntry.user_id == user_id,
+                        SemanticCacheEntry.created_at >= cutoff,
+                    )
+                    .order_by(distance)
+                    .limit(1)
+                    .first()
+                )
+        except Exception as e:
+            logger.warning(f"Semantic cache read failed: {str(e)}")
+            match = None
+
+        if match is None or 1 - match.distance < settings.SEMANTIC_CACHE_THRESHOLD:
+            CACHE_MISSES.inc()
+            return None
+
+        CACHE_HITS.inc()
+        return match.response
+
+    @staticmethod
+    def entry(
+        project_id: str,
+        user_id: str,
+        question: str,
+        embedding: List[float],
+        response: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Row for an answered question, inserted along with the request's other writes"""
+        return {
+            "project_id": project_id,
+            "user_id": user_id,
+            "embedding": embedding,
+            "question": question,
+            "sql": response["sql"],
+            # Encoded by the engine's orjson serializer (Decimal/datetime aware)
+            "response": response,
+        }
+
+    @staticmethod
+    def cacheable(result: Dict[str, Any]) -> bool:
+        """Only results up to SEMANTIC_CACHE_MAX_ROWS rows are stored (full payloads)"""
+        return result["rows_returned"] <= settings.SEMANTIC_CACHE_MAX_ROWS
+
+    @staticmethod
+    def store_entry(connection: Connection, entry: Dict[str, Any]) -> None:
+        """Insert an entry and drop that user's expired ones (background write)"""
+        connection.execute(insert(SemanticCacheEntry), [entry])
+        # Lookups ignore expired rows; deleting them keeps the table bounded
+        cutoff = datetime.utcnow() - timedelta(days=settings.SEMANTIC_CACHE_TTL_DAYS)
+        connection.execute(
+            delete(SemanticCacheEntry).where(
+                SemanticCacheEntry.project_id == entry["project_id"],
+                SemanticCacheEntry.user_id == entry["user_id"],
+                SemanticCacheEntry.created_at < cutoff,
+            )
+        )
+
+    def invalidate(self, project_id: str) -> None:
+        """Drop a project's cached answers (e.g. after its schema changes)"""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return
+
+        try:
+            # Savepoint: a failure (e.g. no pgvector) mustn't abort the caller's transaction
+            with self.db.begin_nested():
+                self.db.query(SemanticCacheEntry).filter(
+                    SemanticCacheEntry.project_id == project_id
+                ).delete(synchronize_session=False)
+        except Exception as e:
+            logger.warning(f"Semantic cache invalidation failed: {str(e)}")
@@ -0,0 +1,130 @@
+from typing import Dict, Any, List, Tuple
+from collections import Counter
+import re
+import orjson
+from langchain.prompts import PromptTemplate
+from langchain_anthropic import ChatAnthropic
+
+from app.core.logging import logger
+
+MAX_SUB_QUERIES = 4
+
+# Comparative wording or a UNION ALL in the first SQL marks a multi-aspect question
+_DECOMPOSE_HINT_RE = re.compile(
+    r"\b(?:compare[ds]?|comparison|versus|vs\.?)\b|\bUNION\s+ALL\b", re.IGNORECASE
+)
+
+# BigQuery types treated as measures when merging; everything else is a dimension
+NUMERIC_TYPES = {"INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC", "BIGNUMERIC"}
+
+DECOMPOSE_TEMPLATE = """Split the analytics question below into at most {max_queries} independent
+sub-questions that can each be answered by one SQL query and then merged on shared dimensions
+(e.g. region, product, date). Each sub-question must be self-contained.
+
+If the question cannot be usefully split, return an array with the original question only.
+
+Return ONLY a JSON array of strings, nothing else.
+
+QUESTION: {question}
+
+JSON:"""
+
+DECOMPOSE_PROMPT = PromptTemplate.from_template(DECOMPOSE_TEMPLATE)
+
+
+class QueryDecomposer:
+    """
+    Splits multi-aspect questions into independent sub-questions and
+    merges the results of their queries
+    """
+
+    def __init__(self, llm: ChatAnthropic):
+        self.chain = DECOMPOSE_PROMPT | llm
+
+    @staticmethod
+    def should_decompose(question: str, sql: str) -> bool:
+        """Only decompose comparative questions or SQL that already stitches results"""
+        return bool(_DECOMPOSE_HINT_RE.search(question) or _DECOMPOSE_HINT_RE.search(sql))
+
+    async def decompose(self, question: str) -> List[str]:
+        """Ask the LLM for independent sub-questions; [] if it can't be split"""
+        try:
+            result = await self.chain.ainvoke(
+                {"question": question, "max_queries": MAX_SUB_QUERIES}
+            )
+            sub_questions = orjson.loads(result.content.strip())
+        except Exception as e:
+            logger.warning(f"Question decomposition failed: {str(e)}")
+            return []
+
+        if not isinstance(sub_questions, list):
+            return []
+
+        sub_questions = [q.strip() for q in sub_questions if isinstance(q, str) and q.strip()]
+        if len(sub_questions) < 2:
+            return []
+
+        return sub_questions[:MAX_SUB_QUERIES]
+
+    @staticmethod
+    def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge sub-query results into one execute_query-shaped result
+        Rows are outer-joined on the dimension columns all results share;
+        without shared dimensions the rows are concatenated
+        """
+        dimension_sets = [
+            {col["name"] for col in result["schema"] if col["type"] not in NUMERIC_TYPES}
+            for result in results
+        ]
+        shared = set.intersection(*dimension_sets)
+        dimensions = [col["name"] for col in results[0]["schema"] if col["name"] in shared]
+
+        # Joined rows would let a column that several results share (e.g. each
+        # sub-query's "revenue") overwrite the others: number those per
+        # sub-query instead (revenue_1, revenue_2)
+        renames: List[Dict[str, str]] = [{} for _ in results]
+        if dimensions:
+            counts = Counter(
+                col["name"]
+                for result in results
+                for col in result["schema"]
+                if col["name"] not in shared
+            )
+            for index, result in enumerate(results):
+                for col in result["schema"]:
+                    if counts[col["name"]] > 1:
+                        renames[index][col["name"]] = f"{col['name']}_{index + 1}"
+
+        schema = []
+        seen = set()
+        for result, renamed in zip(results, renames):
+            for col in result["schema"]:
+                name = renamed.get(col["name"], col["name"])
+                if name not in seen:
+                    seen.add(name)
+                    schema.append({**col, "name": name} if name != col["name"] else col)
+
+        if dimensions:
+            merged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+            for result, renamed in zip(results, renames):
+                for row in result["rows"]:
+                    key = tuple(row.get(name) for name in dimensions)
+                    target = merged.setdefault(key, {})
+                    for name, value in row.items():
+                        target[renamed.get(name, name)] = value
+            rows = list(merged.values())
+        else:
+            rows = [row for result in results for row in result["rows"]]
+
+        column_names = [col["name"] for col in schema]
+        rows = [{name: row.get(name) for name in column_names} for row in rows]
+
+        return {
+            "rows": rows,
+            "schema": schema,
+            "rows_returned": len(rows),
+            # Sub-queries run concurrently, so wall time is the slowest one
+            "execution_time_ms": max(result["execution_time_ms"] for result in results),
+            "bytes_processed": sum(result["bytes_processed"] for result in results),
+        }
@@ -1,12 +1,116 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import re
 import time
-from sqlalchemy.orm import Session
+from uuid import UUID
+import orjson
+from sqlalchemy.orm import Session, load_only, selectinload, raiseload
 from langchain.prompts import PromptTemplate
 from langchain_anthropic import ChatAnthropic
-from langchain.chains import LLMChain
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.core.config import settings
-from app.models import GlobalInstruction, ProjectMemory, ProjectInstruction, Project, Message
+from app.models import GlobalInstruction, Project, Message
+from app.services.cache.schema_cache import get_cached_schema_json, set_cached_schema_json
+from app.services.cache.query_cache import get_cached_sql, set_cached_sql
+from app.services.bigquery.metrics import MATERIALIZED_VIEW_PREFIX
+from app.services.langchain.chains.query_decomposer import QueryDecomposer
+
+NO_SCHEMA_TEXT = "No schema available. Please configure BigQuery connection first."
+
+# Static per project (rules, memory, schema): sent as the system prompt so
+# Anthropic can serve it from the prompt cache across questions
+SQL_SYSTEM_TEMPLATE = """You are a SQL expert specializing in Google BigQuery.
+Your task is to generate precise BigQuery SQL based on the user's question.
+
+GLOBAL RULES (ALWAYS FOLLOW):
+{global_memory}
+
+{project_memory}
+
+{schema}
+
+IMPORTANT FORMATTING RULES:
+- Return ONLY the SQL query, nothing else
+- Do NOT wrap the query in ```sql``` or any markdown
+- Use proper BigQuery syntax (not MySQL or PostgreSQL)
+- Always use fully qualified table names (project.dataset.table)
+- Include appropriate LIMIT clause (default: LIMIT 100)
+- Optimize for performance and cost"""
+
+# Changes every call
+SQL_USER_TEMPLATE = """{conversation_history}
+
+USER QUESTION: {question}
+
+SQL:"""
+
+# Parsed once at import
+SQL_SYSTEM_PROMPT = PromptTemplate.from_template(SQL_SYSTEM_TEMPLATE)
+SQL_USER_PROMPT = PromptTemplate.from_template(SQL_USER_TEMPLATE)
+
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Markdown code fence the LLM sometimes wraps the SQL in
+_CODEBLOCK_RE = re.compile(r"^\s*```(?:sql)?\s*(.*?)\s*```\s*$", re.DOTALL | re.IGNORECASE)
+
+
+def _token_usage(message: Any) -> Optional[Dict[str, int]]:
+    """
+    Token usage as reported by Anthropic, if the message carries it:
+    total (input + output, including prompt-cache reads and writes),
+    cache_read and cache_creation
+    """
+    usage = (getattr(message, "response_metadata", None) or {}).get("usage")
+    if usage and not isinstance(usage, dict):
+        usage = usage.model_dump()
+    if not usage:
+        usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_creation = usage.get("cache_creation_input_tokens") or 0
+    total = (
+        (usage.get("input_tokens") or 0)
+        + (usage.get("output_tokens") or 0)
+        + cache_read
+        + cache_creation
+    )
+    return {"total": total, "cache_read": cache_read, "cache_creation": cache_creation}
+
+
+# Formatted schema text per (project, schema version), evicted LRU; hits skip
+# fetching the schema JSON altogether
+SCHEMA_TEXT_CACHE_MAX_SIZE = 256
+_schema_text_cache: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+
+
+def _format_schema(schema_json: bytes, bigquery_project_id: str, dataset: str) -> str:
+    """Render a schema cache as prompt text"""
+    schema_cache = orjson.loads(schema_json)
+    if not schema_cache:
+        return NO_SCHEMA_TEXT
+
+    lines = ["AVAILABLE TABLES AND SCHEMA:", ""]
+
+    for table_name, table_info in schema_cache.items():
+        lines.append(f"Table: {bigquery_project_id}.{dataset}.{table_name}")
+
+        if table_name.startswith(MATERIALIZED_VIEW_PREFIX):
+            lines.append("(Pre-aggregated roll-up - prefer it when it answers the question)")
+
+        if "columns" in table_info:
+            lines.append("Columns:")
+            for col in table_info["columns"]:
+                col_name = col.get("name", "unknown")
+                col_type = col.get("type", "unknown")
+                lines.append(f"  - {col_name} ({col_type})")
+
+        lines.append("")
+
+    lines.append("")
+    return "\n".join(lines)
 
 
 class TextToSQLChain:
@@ -18,15 +122,17 @@ class TextToSQLChain:
         self,
         project_id: str,
         user_id: str,
-        conversation_id: Optional[str],
+        conversation_id: Optional[UUID],
         db_session: Session,
         model: str = "claude-3-5-sonnet-20241022",
+        enable_prompt_cache: bool = False,
     ):
         self.project_id = project_id
         self.user_id = user_id
         self.conversation_id = conversation_id
         self.db = db_session
         self.model = model
+        self.enable_prompt_cache = enable_prompt_cache
 
         # Initialize Claude LLM
         self.llm = ChatAnthropic(
@@ -36,6 +142,11 @@ class TextToSQLChain:
             anthropic_api_key=settings.ANTHROPIC_API_KEY,
         )
 
+        self.decomposer = QueryDecomposer(self.llm)
+
+        # Project row (with memory/instructions), loaded once per chain
+        self._project: Optional[Project] = None
+
         # Metrics
         self.metrics = {
             "tokens_used": 0,
@@ -61,22 +172,39 @@ class TextToSQLChain:
         memory_text = "\n".join([f"- {inst.instruction_text}" for inst in instructions])
         return memory_text
 
+    def _load_project(self) -> Optional[Project]:
+        """Load the project with its memory and instructions eagerly, once"""
+        if self._project is None:
+            self._project = (
+                self.db.query(Project)
+                .options(
+                    load_only(
+                        Project.bigquery_project_id,
+                        Project.bigquery_dataset,
+                        Project.schema_last_updated,
+                    ),
+                    selectinload(Project.project_memory),
+                    selectinload(Project.project_instructions),
+                    raiseload("*"),
+                )
+                .filter(Project.id == self.project_id)
+                .first()
+            )
+        return self._project
+
     def _load_project_memory(self) -> str:
         """Load project-specific memory (business rules, instructions)"""
+        project = self._load_project()
+        if not project:
+            return "No project-specific rules defined."
+
         # Get business rules
-        rules = (
-            self.db.query(ProjectMemory)
-            .filter(ProjectMemory.project_id == self.project_id)
-            .all()
-        )
+        rules = project.project_memory
 
         # Get project instructions
-        instructions = (
-            self.db.query(ProjectInstruction)
-            .filter(ProjectInstruction.project_id == self.project_id)
-            .filter(ProjectInstruction.active == True)
-            .order_by(ProjectInstruction.priority)
-            .all()
+        instructions = sorted(
+            (inst for inst in project.project_instructions if inst.active),
+            key=lambda inst: inst.priority or 0,
         )
 
         memory_text = ""
@@ -116,34 +244,58 @@ class TextToSQLChain:
         history_text = "RECENT CONVERSATION HISTORY:\n"
         for msg in messages:
             role = msg.role.upper()
-            content = msg.content[:200]  # Truncate long messages
+            content = msg.rendered_content[:200]  # Truncate long messages
             history_text += f"{role}: {content}\n"
 
         return history_text
 
-    def _get_schema_context(self) -> str:
-        """Get BigQuery schema for the project"""
-        project = self.db.query(Project).filter(Project.id == self.project_id).first()
-
-        if not project or not project.schema_cache:
-            return "No schema available. Please configure BigQuery connection first."
-
-        schema_text = "AVAILABLE TABLES AND SCHEMA:\n\n"
+    async def _get_schema_context(self) -> str:
+        """Get BigQuery schema for the project (Redis first, then Postgres)"""
+        project = self._load_project()
 
-        for table_name, table_info in project.schema_cache.items():
-            schema_text += f"Table: {project.bigquery_project_id}.{project.bigquery_dataset}.{table_name}\n"
+        if not project:
+            return NO_SCHEMA_TEXT
 
-            if "columns" in table_info:
-                schema_text += "Columns:\n"
-                for col in table_info["columns"]:
-                    col_name = col.get("name", "unknown")
-                    col_type = col.get("type", "unknown")
-                    schema_text += f"  - {col_name} ({col_type})\n"
+        # Every schema refresh stamps schema_last_updated, so it versions the text
+        key = (
+            str(self.project_id),
+            project.schema_last_updated,
+            project.bigquery_project_id,
+            project.bigquery_dataset,
+        )
+        schema_text = _schema_text_cache.get(key)
+        if schema_text is not None:
+            _schema_text_cache.move_to_end(key)
+            return schema_text
+
+        schema_json = await get_cached_schema_json(str(self.project_id))
+        if schema_json is None:
+            if not project.schema_cache:
+                return NO_SCHEMA_TEXT
+            schema_json = orjson.dumps(project.schema_cache)
+            await set_cached_schema_json(str(self.project_id), schema_json)
+
+        schema_text = _format_schema(
+            schema_json, project.bigquery_project_id, project.bigquery_dataset
+        )
 
-            schema_text += "\n"
+        if project.schema_last_updated is not None:
+            _schema_text_cache[key] = schema_text
+            if len(_schema_text_cache) > SCHEMA_TEXT_CACHE_MAX_SIZE:
+                _schema_text_cache.popitem(last=False)
 
         return schema_text
 
+    async def decompose(self, user_question: str, sql: str) -> List[str]:
+        """
+        Split a multi-aspect question into independent sub-questions
+        Returns [] unless the question (or its first SQL) looks comparative
+        and the LLM finds at least two parts
+        """
+        if not QueryDecomposer.should_decompose(user_question, sql):
+            return []
+        return await self.decomposer.decompose(user_question)
+
     async def generate_sql(self, user_question: str) -> Dict[str, Any]:
         """
         Main method: Generate BigQuery SQL from natural language
@@ -152,83 +304,86 @@ class TextToSQLChain:
             dict: {
                 'sql': str,
                 'tokens_used': int,
+                'cache_read_tokens': int,
+                'cache_creation_tokens': int,
                 'generation_time_ms': int
             }
         """
-        self.metrics["start_time"] = time.time()
+        start_time = time.time()
+        self.metrics["start_time"] = start_time
 
-        # Assemble context from three-tier memory
+        # Rules and instructions are part of the prompt, so they are part of the
+        # question cache key too (edits to them never hit stale SQL)
         global_memory = self._load_global_memory()
         project_memory = self._load_project_memory()
-        conversation_history = self._load_conversation_history()
-        schema = self._get_schema_context()
-
-        # Build prompt template
-        template = """You are a SQL expert specializing in Google BigQuery.
-Your task is to generate precise BigQuery SQL based on the user's question.
-
-GLOBAL RULES (ALWAYS FOLLOW):
-{global_memory}
+        memory = f"{global_memory}\x00{project_memory}"
 
-{project_memory}
-
-{schema}
-
-{conversation_history}
-
-IMPORTANT FORMATTING RULES:
-- Return ONLY the SQL query, nothing else
-- Do NOT wrap the query in ```sql``` or any markdown
-- Use proper BigQuery syntax (not MySQL or PostgreSQL)
-- Always use fully qualified table names (project.dataset.table)
-- Include appropriate LIMIT clause (default: LIMIT 100)
-- Optimize for performance and cost
-
-USER QUESTION: {question}
+        # Equivalent questions reuse earlier SQL; conversation history can
+        # change the answer, so only standalone questions are cached
+        if not self.conversation_id:
+            cached_sql = await get_cached_sql(
+                str(self.project_id), self.model, memory, user_question
+            )
+            if cached_sql is not None:
+                self.metrics["end_time"] = time.time()
+                return {
+                    "sql": cached_sql,
+                    "tokens_used": 0,
+                    "cache_read_tokens": 0,
+                    "cache_creation_tokens": 0,
+                    "generation_time_ms": int(
+                        (self.metrics["end_time"] - start_time) * 1000
+                    ),
+                }
 
-SQL:"""
+        # Assemble context from three-tier memory
+        conversation_history = self._load_conversation_history()
+        schema = await self._get_schema_context()
 
-        prompt = PromptTemplate(
-            input_variables=["question", "global_memory", "project_memory", "schema", "conversation_history"],
-            template=template,
+        system_text = SQL_SYSTEM_PROMPT.format(
+            global_memory=global_memory, project_memory=project_memory, schema=schema
+        )
+        user_text = SQL_USER_PROMPT.format(
+            conversation_history=conversation_history, question=user_question
         )
 
-        # Create chain
-        chain = prompt | self.llm
+        system_block = {"type": "text", "text": system_text}
+        if self.enable_prompt_cache:
+            system_block["cache_control"] = PROMPT_CACHE_CONTROL
 
         # Execute
         try:
-            result = await chain.ainvoke(
-                {
-                    "question": user_question,
-                    "global_memory": global_memory,
-                    "project_memory": project_memory,
-                    "schema": schema,
-                    "conversation_history": conversation_history,
-                }
+            result = await self.llm.ainvoke(
+                [SystemMessage(content=[system_block]), HumanMessage(content=user_text)]
             )
 
-            # Extract SQL from response
-            sql = result.content.strip()
+            # Extract SQL from response, removing a markdown code block if present
+            sql = result.content
+            match = _CODEBLOCK_RE.match(sql)
+            sql = (match.group(1) if match else sql).strip()
 
-            # Remove markdown code blocks if present
-            if sql.startswith("```sql"):
-                sql = sql.replace("```sql", "").replace("```", "").strip()
-            elif sql.startswith("```"):
-                sql = sql.replace("```", "").strip()
+            if not self.conversation_id:
+                await set_cached_sql(
+                    str(self.project_id), self.model, memory, user_question, sql
+                )
 
             # Calculate metrics
             self.metrics["end_time"] = time.time()
 
-            # Estimate tokens (rough approximation: 4 chars = 1 token)
-            total_chars = len(template) + len(user_question) + len(sql)
-            self.metrics["tokens_used"] = total_chars // 4
+            usage = _token_usage(result)
+            if usage is None:
+                # Estimate tokens (rough approximation: 4 chars = 1 token)
+                total_chars = len(system_text) + len(user_text) + len(sql)
+                usage = {"total": total_chars // 4, "cache_read": 0, "cache_creation": 0}
+            self.metrics["tokens_used"] = usage["total"]
 
             return {
                 "sql": sql,
-                "tokens_used": self.metrics["tokens_used"],
+                "tokens_used": usage["total"],
+                "cache_read_tokens": usage["cache_read"],
+                "cache_creation_tokens": usage["cache_creation"],
                 "generation_time_ms": int(
-                    (self.metrics["end_time"] - self.metrics["start_time"]) * 1000
+                    (self.metrics["end_time"] - start_time) * 1000
                 ),
             }
 
@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import asyncio
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app.db.session import engine
+from app.models import QueryLog
+from app.core.config import settings
+from app.core.logging import logger
+
+_QUERY_LOG_COLUMNS = tuple(column.key for column in QueryLog.__table__.columns)
+_QUERY_LOG_SCALAR_DEFAULTS = {
+    column.key: column.default.arg
+    for column in QueryLog.__table__.columns
+    if column.default is not None and column.default.is_scalar
+}
+
+
+# Queued by stop() to end the flusher after the rows ahead of it
+_STOP: Any = object()
+
+
+def query_log_row(log_entry: QueryLog) -> Dict[str, Any]:
+    """Column values of a (transient) QueryLog, for a Core insert"""
+    row = {column: getattr(log_entry, column) for column in _QUERY_LOG_COLUMNS}
+    # Column defaults aren't applied to explicit None values
+    if row["created_at"] is None:
+        row["created_at"] = datetime.utcnow()
+    for column, default in _QUERY_LOG_SCALAR_DEFAULTS.items():
+        if row[column] is None:
+            row[column] = default
+    return row
+
+
+class QueryLogBuffer:
+    """
+    Collects QueryLog rows off the request path and bulk-inserts them
+    from a background task (every flush_interval seconds or max_batch rows)
+    """
+
+    def __init__(self, max_batch: int = 100, flush_interval: float = 0.5):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the background flusher (call from the running event loop)"""
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still queued"""
+        if self._task is not None:
+            # A sentinel rather than cancel(): the flusher writes the batch
+            # it is collecting before it exits
+            self._queue.put_nowait(_STOP)
+            await self._task
+            self._task = None
+
+        remaining = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not _STOP:
+                remaining.append(row)
+        if remaining:
+            await self._flush(remaining)
+
+    def put(self, log_entry: QueryLog) -> None:
+        """Queue a log entry; returns immediately"""
+        self._queue.put_nowait(query_log_row(log_entry))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            row = await self._queue.get()
+            if row is _STOP:
+                return
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    await self._flush(batch)
+                    return
+                batch.append(row)
+
+            await self._flush(batch)
+
+    async def _flush(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            await asyncio.to_thread(self._insert, rows)
+        except Exception as e:
+            logger.error(f"Flushing {len(rows)} query logs failed: {str(e)}")
+
+    @staticmethod
+    def _insert(rows: List[Dict[str, Any]]) -> None:
+        # executemany: batched into multi-row INSERTs by the psycopg2 dialect
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(QueryLog.__table__), rows)
+            return
+        except IntegrityError as e:
+            if len(rows) == 1:
+                raise
+            logger.warning(f"Bulk query log insert failed, retrying row by row: {str(e)}")
+
+        # One bad row (e.g. an unknown conversation_id) mustn't drop the others
+        for row in rows:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(QueryLog.__table__), [row])
+            except IntegrityError as e:
+                logger.error(f"Dropping query log {row['id']}: {str(e)}")
+
+
+query_log_buffer = QueryLogBuffer(
+    max_batch=settings.QUERY_LOG_BATCH_SIZE, flush_interval=settings.QUERY_LOG_FLUSH_INTERVAL
+)
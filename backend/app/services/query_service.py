@@ -1,12 +1,64 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from datetime import datetime, timedelta
+import asyncio
 import time
-from uuid import UUID, uuid4
+from uuid import UUID
+from uuid6 import uuid7
+from sqlalchemy import func, insert, update
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
 from app.services.langchain.chains.text_to_sql_chain import TextToSQLChain
+from app.services.langchain.chains.query_decomposer import QueryDecomposer
 from app.services.bigquery.bigquery_service import BigQueryService
+from app.services.bigquery.sql_safety import sql_is_dangerous
 from app.models import QueryLog, Conversation, Message
 from app.core.logging import logger
+from app.core.responses import json_dumps
+from app.services.query_log_buffer import query_log_buffer, query_log_row
+from app.services.cache.semantic_cache import SemanticCache
+from app.services.background_writes import write_in_background
+from app.core.config import settings
+
+# Column types collapsed to the kinds the chart heuristic cares about
+_COLUMN_KINDS = {
+    "DATE": "TEMPORAL",
+    "DATETIME": "TEMPORAL",
+    "TIMESTAMP": "TEMPORAL",
+    "STRING": "STRING",
+    "INTEGER": "NUMERIC",
+    "FLOAT": "NUMERIC",
+    "NUMERIC": "NUMERIC",
+}
+
+_DATA_VIEW_CHART = {"type": "table", "title": "Data View"}
+_LINE_CHART = {"type": "line", "title": "Trend Over Time"}
+
+# (column count capped at 3, first column kind, second column kind) -> chart
+_CHART_RULES = {
+    (1, None, None): {"type": "metric", "title": "Single Value"},
+    (2, "STRING", "NUMERIC"): {"type": "bar", "title": "Comparison"},
+    **{(2, "TEMPORAL", kind): _LINE_CHART for kind in (None, "TEMPORAL", "STRING", "NUMERIC")},
+    (3, None, None): {"type": "table", "title": "Data Table"},
+}
+
+
+def _write_conversation(
+    connection: Connection, conversation_id: UUID, messages: List[Dict[str, Any]], title: str
+) -> None:
+    # Both messages in one multi-row INSERT
+    connection.execute(insert(Message), messages)
+    # Bumps updated_at; the first question becomes the title if none is set yet
+    connection.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(title=func.coalesce(func.nullif(Conversation.title, ""), title))
+    )
+
+
+def _write_query_log(connection: Connection, row: Dict[str, Any]) -> None:
+    # Plain INSERT: the entry is never read back, so skip the unit of work
+    connection.execute(insert(QueryLog), [row])
 
 
 class QueryService:
@@ -23,7 +75,7 @@ class QueryService:
         project_id: str,
         user_id: str,
         question: str,
-        conversation_id: Optional[str] = None,
+        conversation_id: Optional[UUID] = None,
         model: str = "claude-3-5-sonnet-20241022",
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None,
@@ -38,8 +90,8 @@ class QueryService:
         Returns:
             dict: Complete query response with SQL, results, insights
         """
-        total_start_time = time.time()
-        query_log_id = uuid4()
+        total_start_ns = time.perf_counter_ns()
+        query_log_id = uuid7()
 
         # Initialize log entry
         log_entry = QueryLog(
@@ -53,9 +105,22 @@ class QueryService:
             user_agent=user_agent,
         )
 
+        # Standalone questions can be answered from earlier near-duplicates;
+        # conversation context can change the answer, so those always run
+        semantic_cache = None
+        question_embedding = None
+        if settings.SEMANTIC_CACHE_ENABLED and not conversation_id:
+            semantic_cache = SemanticCache(self.db)
+            question_embedding = await semantic_cache.embed(question)
+
         try:
+            if question_embedding is not None:
+                cached = semantic_cache.lookup(project_id, user_id, question_embedding)
+                if cached is not None:
+                    return self._cached_response(cached, log_entry, total_start_ns)
+
             # Step 1: Generate SQL using LangChain
-            logger.info(f"Generating SQL for question: {question}")
+            logger.debug("Generating SQL for question: {}", question)
 
             sql_chain = TextToSQLChain(
                 project_id=project_id,
@@ -63,6 +128,7 @@ class QueryService:
                 conversation_id=conversation_id,
                 db_session=self.db,
                 model=model,
+                enable_prompt_cache=True,
             )
 
             sql_result = await sql_chain.generate_sql(question)
@@ -71,19 +137,40 @@ class QueryService:
             log_entry.generated_sql = sql_result["sql"]
             log_entry.sql_generation_time_ms = sql_result["generation_time_ms"]
             log_entry.sql_tokens_used = sql_result["tokens_used"]
+            log_entry.cache_read_tokens = sql_result["cache_read_tokens"]
+            log_entry.cache_creation_tokens = sql_result["cache_creation_tokens"]
 
             # Step 2: Validate SQL (optional safety check)
-            if self._is_dangerous_sql(sql_result["sql"]):
+            if sql_is_dangerous(sql_result["sql"]):
                 raise Exception("SQL query contains forbidden operations (DROP, DELETE, etc.)")
 
             # Step 3: Execute SQL on BigQuery
-            logger.info("Executing SQL on BigQuery")
+            logger.debug("Executing SQL on BigQuery")
 
             bigquery_service = BigQueryService(
                 project_id=project_id, db_session=self.db
             )
 
-            execution_result = await bigquery_service.execute_query(sql_result["sql"])
+            # Multi-aspect questions run as independent sub-queries in parallel
+            sub_questions = await sql_chain.decompose(question, sql_result["sql"])
+            if sub_questions:
+                logger.info("Question decomposed into {} sub-queries", len(sub_questions))
+                sub_sql_result, execution_result = await self._run_sub_queries(
+                    sql_chain, bigquery_service, sub_questions
+                )
+                sql_result["sql"] = sub_sql_result["sql"]
+                sql_result["tokens_used"] += sub_sql_result["tokens_used"]
+                sql_result["generation_time_ms"] += sub_sql_result["generation_time_ms"]
+                for key in ("cache_read_tokens", "cache_creation_tokens"):
+                    sql_result[key] += sub_sql_result[key]
+
+                log_entry.generated_sql = sql_result["sql"]
+                log_entry.sql_generation_time_ms = sql_result["generation_time_ms"]
+                log_entry.sql_tokens_used = sql_result["tokens_used"]
+                log_entry.cache_read_tokens = sql_result["cache_read_tokens"]
+                log_entry.cache_creation_tokens = sql_result["cache_creation_tokens"]
+            else:
+                execution_result = await bigquery_service.execute_query(sql_result["sql"])
 
             # Update log
             log_entry.execution_status = "success"
@@ -91,17 +178,9 @@ class QueryService:
             log_entry.rows_returned = execution_result["rows_returned"]
             log_entry.bytes_processed = execution_result["bytes_processed"]
 
-            # Step 4: Generate insights (optional - can be done with another LLM call)
-            insights = self._generate_basic_insights(execution_result)
-
-            # Step 5: Suggest visualization
-            chart_suggestion = self._suggest_chart(execution_result)
-
-            # Calculate total time
-            total_time_ms = int((time.time() - total_start_time) * 1000)
-
-            # Save log to database
-            self.db.add(log_entry)
+            # Persistence doesn't depend on insights: start the writes first so
+            # they proceed in the background while the response is assembled
+            self._record_log(log_entry)
 
             # Save to conversation if provided
             if conversation_id:
@@ -112,9 +191,31 @@ class QueryService:
                     tokens=sql_result["tokens_used"],
                 )
 
-            self.db.commit()
+            # Step 4: Generate insights (optional - can be done with another LLM call)
+            insights = self._generate_basic_insights(execution_result)
+
+            # Step 5: Suggest visualization
+            chart_suggestion = self._suggest_chart(execution_result)
+
+            if question_embedding is not None and SemanticCache.cacheable(execution_result):
+                cache_entry = SemanticCache.entry(
+                    project_id=project_id,
+                    user_id=user_id,
+                    question=question,
+                    embedding=question_embedding,
+                    response={
+                        "sql": sql_result["sql"],
+                        "result": execution_result,
+                        "insights": insights,
+                        "suggested_chart": chart_suggestion,
+                    },
+                )
+                write_in_background(SemanticCache.store_entry, cache_entry)
+
+            # Calculate total time
+            total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
 
-            logger.info(f"Query processed successfully in {total_time_ms}ms")
+            logger.info("Query processed successfully in {}ms", total_time_ms)
 
             return {
                 "query_id": query_log_id,
@@ -131,15 +232,15 @@ class QueryService:
         except Exception as e:
             # Log error
             logger.error(f"Query processing failed: {str(e)}")
+            self._discard_transaction()
 
             log_entry.execution_status = "failed"
             log_entry.error_message = str(e)
             log_entry.error_type = type(e).__name__
 
-            self.db.add(log_entry)
-            self.db.commit()
+            self._record_log(log_entry)
 
-            total_time_ms = int((time.time() - total_start_time) * 1000)
+            total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
 
             return {
                 "query_id": query_log_id,
@@ -153,16 +254,218 @@ class QueryService:
                 "error": str(e),
             }
 
-    def _is_dangerous_sql(self, sql: str) -> bool:
-        """Check for dangerous SQL operations"""
-        sql_upper = sql.upper()
-        forbidden_keywords = ["DROP", "DELETE", "TRUNCATE", "ALTER", "CREATE", "UPDATE"]
+    async def stream_question(
+        self,
+        project_id: str,
+        user_id: str,
+        question: str,
+        conversation_id: Optional[UUID] = None,
+        model: str = "claude-3-5-sonnet-20241022",
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Streaming variant of process_question, yielding NDJSON lines:
+        1. {"type": "sql", ...} once the SQL is generated
+        2. {"type": "schema", ...} then {"type": "rows", ...} per BigQuery page
+        3. {"type": "done", ...} with stats and insights, or {"type": "error", ...}
+        """
+        total_start_ns = time.perf_counter_ns()
+        query_log_id = uuid7()
+
+        log_entry = QueryLog(
+            id=query_log_id,
+            user_id=user_id,
+            project_id=project_id,
+            conversation_id=conversation_id,
+            user_question=question,
+            model_used=model,
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+
+        try:
+            logger.debug("Generating SQL for streamed question: {}", question)
+
+            sql_chain = TextToSQLChain(
+                project_id=project_id,
+                user_id=user_id,
+                conversation_id=conversation_id,
+                db_session=self.db,
+                model=model,
+                enable_prompt_cache=True,
+            )
+
+            sql_result = await sql_chain.generate_sql(question)
+
+            log_entry.generated_sql = sql_result["sql"]
+            log_entry.sql_generation_time_ms = sql_result["generation_time_ms"]
+            log_entry.sql_tokens_used = sql_result["tokens_used"]
+            log_entry.cache_read_tokens = sql_result["cache_read_tokens"]
+            log_entry.cache_creation_tokens = sql_result["cache_creation_tokens"]
+
+            if sql_is_dangerous(sql_result["sql"]):
+                raise Exception("SQL query contains forbidden operations (DROP, DELETE, etc.)")
+
+            yield json_dumps({
+                "type": "sql",
+                "query_id": query_log_id,
+                "sql": sql_result["sql"],
+                "tokens_used": sql_result["tokens_used"],
+                "sql_generation_time_ms": sql_result["generation_time_ms"],
+            }) + b"\n"
+
+            bigquery_service = BigQueryService(project_id=project_id, db_session=self.db)
+
+            schema = []
+            stats: Dict[str, Any] = {}
+            async for event in bigquery_service.stream_query(sql_result["sql"]):
+                if event["type"] == "stats":
+                    stats = event
+                    continue
+                if event["type"] == "schema":
+                    schema = event["schema"]
+                yield json_dumps(event) + b"\n"
+
+            log_entry.execution_status = "success"
+            log_entry.execution_time_ms = stats["execution_time_ms"]
+            log_entry.rows_returned = stats["rows_returned"]
+            log_entry.bytes_processed = stats["bytes_processed"]
+
+            summary = {"schema": schema, "rows_returned": stats["rows_returned"]}
+            insights = self._generate_basic_insights(summary)
+            chart_suggestion = self._suggest_chart(summary)
+
+            self._record_log(log_entry)
+
+            if conversation_id:
+                self._save_to_conversation(
+                    conversation_id=conversation_id,
+                    question=question,
+                    sql=sql_result["sql"],
+                    tokens=sql_result["tokens_used"],
+                )
 
-        for keyword in forbidden_keywords:
-            if keyword in sql_upper:
-                return True
+            total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
+            logger.info("Streamed query processed successfully in {}ms", total_time_ms)
 
-        return False
+            yield json_dumps({
+                "type": "done",
+                "rows_returned": stats["rows_returned"],
+                "execution_time_ms": stats["execution_time_ms"],
+                "bytes_processed": stats["bytes_processed"],
+                "insights": insights,
+                "suggested_chart": chart_suggestion,
+                "total_time_ms": total_time_ms,
+            }) + b"\n"
+
+        except Exception as e:
+            logger.error(f"Streamed query processing failed: {str(e)}")
+            self._discard_transaction()
+
+            log_entry.execution_status = "failed"
+            log_entry.error_message = str(e)
+            log_entry.error_type = type(e).__name__
+
+            self._record_log(log_entry)
+
+            yield json_dumps({
+                "type": "error",
+                "query_id": query_log_id,
+                "error": str(e),
+                "total_time_ms": (time.perf_counter_ns() - total_start_ns) // 1_000_000,
+            }) + b"\n"
+
+    async def _run_sub_queries(
+        self,
+        sql_chain: TextToSQLChain,
+        bigquery_service: BigQueryService,
+        sub_questions: List[str],
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Generate and execute SQL for each sub-question concurrently, then merge"""
+        # Each sub-query runs as soon as its own SQL is ready, overlapping
+        # BigQuery execution with generation of the remaining sub-queries
+        pipelines = await asyncio.gather(
+            *(
+                self._run_sub_query(sql_chain, bigquery_service, sub_question)
+                for sub_question in sub_questions
+            )
+        )
+        sql_results = [sql_result for sql_result, _ in pipelines]
+        execution_results = [execution_result for _, execution_result in pipelines]
+
+        sql_result = {
+            "sql": ";\n\n".join(sub_result["sql"] for sub_result in sql_results),
+            "tokens_used": sum(sub_result["tokens_used"] for sub_result in sql_results),
+            "cache_read_tokens": sum(
+                sub_result["cache_read_tokens"] for sub_result in sql_results
+            ),
+            "cache_creation_tokens": sum(
+                sub_result["cache_creation_tokens"] for sub_result in sql_results
+            ),
+            "generation_time_ms": max(
+                sub_result["generation_time_ms"] for sub_result in sql_results
+            ),
+        }
+        return sql_result, QueryDecomposer.merge_results(execution_results)
+
+    async def _run_sub_query(
+        self, sql_chain: TextToSQLChain, bigquery_service: BigQueryService, sub_question: str
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        sql_result = await sql_chain.generate_sql(sub_question)
+        if sql_is_dangerous(sql_result["sql"]):
+            raise Exception("SQL query contains forbidden operations (DROP, DELETE, etc.)")
+        return sql_result, await bigquery_service.execute_query(sql_result["sql"])
+
+    def _cached_response(
+        self, cached: Dict[str, Any], log_entry: QueryLog, total_start_ns: int
+    ) -> Dict[str, Any]:
+        """Answer from a semantic cache hit, still logging the query"""
+        result = cached["result"]
+
+        log_entry.cache_hit = True
+        log_entry.generated_sql = cached["sql"]
+        log_entry.sql_generation_time_ms = 0
+        log_entry.sql_tokens_used = 0
+        log_entry.execution_status = "success"
+        log_entry.execution_time_ms = 0
+        log_entry.rows_returned = result["rows_returned"]
+        log_entry.bytes_processed = 0
+
+        self._record_log(log_entry)
+
+        total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
+        logger.info("Query answered from semantic cache in {}ms", total_time_ms)
+
+        return {
+            "query_id": log_entry.id,
+            "sql": cached["sql"],
+            "result": result,
+            "insights": cached["insights"],
+            "suggested_chart": cached["suggested_chart"],
+            "tokens_used": 0,
+            "sql_generation_time_ms": 0,
+            "total_time_ms": total_time_ms,
+            "error": None,
+        }
+
+    def _record_log(self, log_entry: QueryLog) -> None:
+        """Hand the log to the background bulk writer, or to a one-off background write"""
+        if query_log_buffer.is_running:
+            query_log_buffer.put(log_entry)
+        else:
+            # Committed on a worker thread rather than on the event loop
+            write_in_background(_write_query_log, query_log_row(log_entry))
+
+    def _discard_transaction(self) -> None:
+        """
+        Roll back whatever the failed request left open on the session (the
+        writes themselves run in their own transactions)
+        """
+        try:
+            self.db.rollback()
+        except Exception as e:
+            logger.warning(f"Session rollback failed: {str(e)}")
 
     def _generate_basic_insights(self, result: Dict[str, Any]) -> str:
         """Generate basic insights from query results"""
@@ -186,81 +489,65 @@ class QueryService:
         if rows_count == 0 or len(schema) == 0:
             return None
 
-        # Simple heuristic
-        if len(schema) == 1:
-            return {"type": "metric", "title": "Single Value"}
-
+        # Only two-column results look at column types
         if len(schema) == 2:
-            # Check if first column is date/string and second is numeric
-            col1_type = schema[0]["type"]
-            col2_type = schema[1]["type"]
-
-            if col1_type in ["DATE", "DATETIME", "TIMESTAMP"]:
-                return {"type": "line", "title": "Trend Over Time"}
-            elif col1_type == "STRING" and col2_type in ["INTEGER", "FLOAT", "NUMERIC"]:
-                return {"type": "bar", "title": "Comparison"}
-
-        if len(schema) >= 3:
-            return {"type": "table", "title": "Data Table"}
+            key = (2, _COLUMN_KINDS.get(schema[0]["type"]), _COLUMN_KINDS.get(schema[1]["type"]))
+        else:
+            key = (min(len(schema), 3), None, None)
 
-        return {"type": "table", "title": "Data View"}
+        return _CHART_RULES.get(key, _DATA_VIEW_CHART)
 
     def _save_to_conversation(
         self,
-        conversation_id: str,
+        conversation_id: UUID,
         question: str,
         sql: str,
         tokens: int,
     ):
-        """Save question and response to conversation"""
-        # Save user message
-        user_message = Message(
-            conversation_id=conversation_id,
-            role="user",
-            content=question,
-            tokens_used=0,
-        )
-        self.db.add(user_message)
-
-        # Save assistant message with SQL
-        assistant_content = f"Generated SQL:\n```sql\n{sql}\n```"
-        assistant_message = Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=assistant_content,
-            tokens_used=tokens,
-        )
-        self.db.add(assistant_message)
-
-        # Update conversation updated_at
-        conversation = self.db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        if conversation:
-            # Auto-generate title from first question if not set
-            if not conversation.title:
-                conversation.title = question[:100]
+        """Save question and response to conversation (written in the background)"""
+        now = datetime.utcnow()
+        messages = [
+            {
+                "conversation_id": conversation_id,
+                "role": "user",
+                "content": question,
+                "content_type": "text",
+                "tokens_used": 0,
+                "created_at": now,
+            },
+            {
+                "conversation_id": conversation_id,
+                "role": "assistant",
+                # Stored raw; the markdown is added when the message is read
+                "content": sql,
+                "content_type": "sql",
+                "tokens_used": tokens,
+                # Keeps the pair ordered when history is sorted by created_at
+                "created_at": now + timedelta(microseconds=1),
+            },
+        ]
+        write_in_background(_write_conversation, conversation_id, messages, question[:100])
 
     async def execute_sql_directly(
         self,
         project_id: str,
         user_id: str,
         sql: str,
-        conversation_id: Optional[str] = None,
+        conversation_id: Optional[UUID] = None,
     ) -> Dict[str, Any]:
         """Execute SQL directly without text-to-SQL conversion"""
-        total_start_time = time.time()
+        total_start_ns = time.perf_counter_ns()
 
         try:
             # Validate SQL
-            if self._is_dangerous_sql(sql):
+            if sql_is_dangerous(sql):
                 raise Exception("SQL contains forbidden operations")
 
             # Execute on BigQuery
             bigquery_service = BigQueryService(project_id=project_id, db_session=self.db)
             result = await bigquery_service.execute_query(sql)
 
-            total_time_ms = int((time.time() - total_start_time) * 1000)
+            total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
 
             return {
                 "sql": sql,
@@ -271,7 +558,8 @@ class QueryService:
 
         except Exception as e:
             logger.error(f"Direct SQL execution failed: {str(e)}")
-            total_time_ms = int((time.time() - total_start_time) * 1000)
+            self._discard_transaction()
+            total_time_ms = (time.perf_counter_ns() - total_start_ns) // 1_000_000
 
             return {
                 "sql": sql,
@@ -0,0 +1,5 @@
+import os
+
+# Required settings, so app modules import without a .env
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/talktodata")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
@@ -0,0 +1,59 @@
+from app.services.langchain.chains.query_decomposer import QueryDecomposer
+
+
+def _result(rows, schema):
+    return {
+        "rows": rows,
+        "schema": schema,
+        "rows_returned": len(rows),
+        "execution_time_ms": 10,
+        "bytes_processed": 100,
+    }
+
+
+REVENUE_SCHEMA = [{"name": "region", "type": "STRING"}, {"name": "revenue", "type": "FLOAT"}]
+
+
+def test_merge_numbers_measures_shared_across_sub_queries():
+    merged = QueryDecomposer.merge_results(
+        [
+            _result([{"region": "EU", "revenue": 10.0}], REVENUE_SCHEMA),
+            _result(
+                [{"region": "EU", "revenue": 7.0}, {"region": "US", "revenue": 3.0}],
+                REVENUE_SCHEMA,
+            ),
+        ]
+    )
+
+    assert [col["name"] for col in merged["schema"]] == ["region", "revenue_1", "revenue_2"]
+    assert merged["rows"] == [
+        {"region": "EU", "revenue_1": 10.0, "revenue_2": 7.0},
+        {"region": "US", "revenue_1": None, "revenue_2": 3.0},
+    ]
+    assert merged["bytes_processed"] == 200
+
+
+def test_merge_keeps_distinct_measure_names():
+    merged = QueryDecomposer.merge_results(
+        [
+            _result([{"region": "EU", "revenue": 10.0}], REVENUE_SCHEMA),
+            _result(
+                [{"region": "EU", "orders": 4}],
+                [{"name": "region", "type": "STRING"}, {"name": "orders", "type": "INTEGER"}],
+            ),
+        ]
+    )
+
+    assert merged["rows"] == [{"region": "EU", "revenue": 10.0, "orders": 4}]
+
+
+def test_merge_without_shared_dimensions_concatenates():
+    merged = QueryDecomposer.merge_results(
+        [
+            _result([{"region": "EU", "revenue": 10.0}], REVENUE_SCHEMA),
+            _result([{"total": 5}], [{"name": "total", "type": "INTEGER"}]),
+        ]
+    )
+
+    assert merged["rows_returned"] == 2
+    assert merged["rows"][1] == {"region": None, "revenue": None, "total": 5}